@@ -10,6 +10,8 @@ NETWORK_TEST_PORTS = [5011, 5012, 5013, 5014, 5015] # TCP ports for network test
 
 # Buffer sizes
 BUFFER_SIZE_FOR_HEADER = 2048 # Buffer for receiving initial headers (should be large enough for header string)
+WRITEV_BATCH_SLOTS = 8 # Max number of received chunks drained to disk per os.writev() call (receiver side, where available)
+WRITEV_BATCH_MAX_BYTES = 4 * 1024 * 1024 # Cap on memory preallocated for the writev receive buffers (fewer slots for large buffers)
 
 # Separators used in network messages
 HEADER_SEPARATOR = "|" # Separator for header parts (used in all protocols)
@@ -49,12 +51,26 @@ HANDSHAKE_READ_BUFFER_SIZE = 1024 # Buffer size for receiving handshake signals
 # Network Test Settings
 NETWORK_TEST_SIZE = 100 * 1024 * 1024 # Amount of data to send/receive during network test (100 MB)
 NETWORK_TEST_PROTOCOL_HEADER = "NET_TEST_START" # Message sent by client to initiate network test transfer
+NETWORK_TEST_MIN_RECV_SIZE = 1024 * 1024 # Minimum bytes per recv call on the network test receiver (the GUI test buffer only raises it)
+NETWORK_TEST_LISTEN_BACKLOG = 64 # Pending connection queue of the network test TCP server (handlers run on a shared thread pool)
+NETWORK_TEST_SOCKET_BUFFER_FACTOR = 4 # Kernel SO_RCVBUF/SO_SNDBUF for an accepted test connection = test buffer size x this (clamped to the system maximum)
+NETWORK_TEST_SEND_SOCKET_BUFFER = 4 * 1024 * 1024 # Kernel SO_SNDBUF for the network test sender socket (clamped to the system maximum)
+NETWORK_TEST_SEND_NODELAY = False # TCP_NODELAY on the network test sender socket; off because Nagle merges the many small sends of small test buffers into full segments
+NETWORK_TEST_USE_SENDFILE = False # Network test sender pushes the data with sendfile() from a temporary file where available (kernel-side copy) instead of sendmsg() from memory
+NETWORK_TEST_PIN_TO_NIC_NUMA_NODE = False # Linux: run each network test receive handler on the CPUs of the receiving NIC's NUMA node (multi-socket servers)
+
+DISCOVERY_UDP_RECV_BUFFER_SIZE = 512 * 1024 # SO_RCVBUF for network test discovery UDP sockets, so bursts of broadcasts/responses are not dropped
 
 # Network timeouts and intervals
 DISCOVERY_TIMEOUT = 5 # Seconds client waits for server discovery response
 SPEED_UPDATE_INTERVAL = 0.5 # Seconds between updating speed display during transfer/test
+DISCOVERY_LISTENER_IDLE_TIMEOUT = 5.0 # Seconds the network test discovery listener may sleep in select() before re-checking its stop event (normally woken up immediately)
 CANCEL_CHECK_INTERVAL = 0.5 # Seconds timeout for blocking calls (like recv/send) or file I/O to allow checking cancel events periodically
 
+# GUI status area
+STATUS_MAX_LINES = 5000 # Maximum number of lines kept in the status text area (oldest lines are dropped)
+STATUS_FLUSH_INTERVAL_MS = 100 # Queued status messages are written to the status area at most this often, in one insert
+
 # Handshake timeout (client side waits for server response)
 HANDSHAKE_TIMEOUT = 30 # Seconds to wait for handshake response
 
@@ -66,6 +82,11 @@ DATA_TRANSFER_TIMEOUT = 10.0 # Increased from 5.0 based on testing potential iss
 # --- Drive Test Settings ---
 TEST_FILE_SIZE = 100 * 1024 * 1024 # Size of the temporary file used for drive speed tests (100 MB)
 TEST_FILE_NAME = "._speed_test_file_.tmp" # Name of the temporary file (hidden on some systems with '.')
+DRIVE_TEST_DIRECT_IO = False # Write test bypasses the OS page cache with O_DIRECT where supported (Linux); buffered writes otherwise
+DIRECT_IO_ALIGNMENT = 4096 # Buffer/length alignment in bytes for O_DIRECT writes (multiple of 512, safe for 4K-sector drives)
+PARALLEL_READ_WRITE = False # "All tests" runs the write and read tests at the same time (read uses a second file); False runs them one after the other
+PARALLEL_READ_TEST_FILE_NAME = "._speed_test_file_read_.tmp" # Second test file read while the write test runs (parallel mode only)
+TEST_RANDOM_CONTENT = True # Fill a missing read-test file with random data; False preallocates it with posix_fallocate (fast, but reads of never-written blocks may not touch the drive)
 
 # Options for Buffer Size Comboboxes
 BUFFER_OPTIONS = {
@@ -82,12 +82,12 @@ class Application:
         # They are wrapped in utils.safe_gui_update where necessary before passing to threads.
         self.gui_callbacks = {
             'root': self.root, # Pass the root window object (needed by utils.safe_gui_update)
-            'update_status': lambda msg: utils.safe_gui_update(self.root, utils._update_status_direct, self.status_area, msg),
-            'update_progress': lambda val: utils.safe_gui_update(self.root, utils._update_progress_direct, self.progress_bar, val),
-            'update_speed': lambda msg: utils.safe_gui_update(self.root, utils._update_speed_direct, self.speed_var, msg),
-            'show_info': lambda title, msg: utils.safe_gui_update(self.root, utils._show_messagebox_direct, 'info', title, msg),
-            'show_warning': lambda title, msg: utils.safe_gui_update(self.root, utils._show_messagebox_direct, 'warning', title, msg),
-            'show_error': lambda title, msg: utils.safe_gui_update(self.root, utils._show_messagebox_direct, 'error', title, msg),
+            'update_status': lambda msg: utils.queue_status_update(self.root, self.status_area, msg), # Messages are batched into one insert per drain
+            'update_progress': lambda val: utils.queue_latest_update(self.root, utils._update_progress_direct, self.progress_bar, val), # Pending updates collapse to the newest value
+            'update_speed': lambda msg: utils.queue_latest_update(self.root, utils._update_speed_direct, self.speed_var, msg),
+            'show_info': lambda title, msg: utils.show_messagebox_after_status(self.root, self.status_area, 'info', title, msg), # Pending status lines are shown before the dialog opens
+            'show_warning': lambda title, msg: utils.show_messagebox_after_status(self.root, self.status_area, 'warning', title, msg),
+            'show_error': lambda title, msg: utils.show_messagebox_after_status(self.root, self.status_area, 'error', title, msg),
 
             # Callbacks for state changes signalled by worker threads (run in GUI thread by definition)
             'on_transfer_started': self._on_transfer_started,
@@ -697,7 +697,7 @@ class Application:
             print("DEBUG: start_server_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         # The status update "--- شروع حالت سرور..." is now done in _set_active_server_port callback
         # gui_callbacks['update_status']("--- شروع حالت سرور...")
         print("DEBUG: Starting file/folder transfer server mode")
@@ -777,7 +777,7 @@ class Application:
              return
 
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         utils.safe_gui_update(self.root, self.gui_callbacks['update_status'], "--- شروع حالت کلاینت (فرستنده) ---") # Updated text
         print("DEBUG: Starting client sender mode")
 
@@ -840,7 +840,7 @@ class Application:
             print("DEBUG: start_write_test_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         # Status update is handled inside the test wrapper now
 
         selected_buffer_option = self.test_buffer_size_var.get()
@@ -888,7 +888,7 @@ class Application:
             print("DEBUG: start_read_test_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
          # Status update is handled inside the test wrapper now
 
         selected_buffer_option = self.test_buffer_size_var.get()
@@ -934,7 +934,7 @@ class Application:
             print("DEBUG: start_all_tests_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         # Initial status update is handled inside the all_tests_task
 
         selected_buffer_option = self.test_buffer_size_var.get()
@@ -982,7 +982,7 @@ class Application:
             print("DEBUG: start_network_test_server_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         # The status update "--- شروع حالت دریافت کننده تست شبکه..." is now done in _set_active_network_test_server_port callback
         # self.gui_callbacks['update_status']("--- شروع حالت دریافت کننده تست شبکه ---")
         print("DEBUG: Starting network test receiver mode")
@@ -1060,7 +1060,7 @@ class Application:
             print("DEBUG: start_network_test_client_ui called during active operation, ignoring.")
             return
 
-        self.status_area.delete('1.0', tk.END)
+        utils.clear_status_area(self.status_area)
         # Initial status update is handled inside the client task
         # self.gui_callbacks['update_status']("--- شروع حالت فرستنده تست شبکه ---")
 
@@ -1103,7 +1103,7 @@ class Application:
         # Check if any test operation is actually active before showing message/setting event
         if self.is_write_test_active or self.is_read_test_active or self.is_all_tests_active or self.is_network_test_client_active:
             utils.safe_gui_update(self.root, self.gui_callbacks['update_status'], "[*] درخواست لغو تست...")
-            self.cancel_test_event.set() # Set the event to signal cancellation
+            tests.cancel_test(self.cancel_test_event) # Set the event to signal cancellation (and wake a waiting network test sender)
         else:
             utils.safe_gui_update(self.root, self.gui_callbacks['update_status'], "[*] تستی در حال حاضر برای لغو وجود ندارد.")
 
@@ -1114,9 +1114,9 @@ class Application:
         self.server_stop_event.set()
         self.discovery_stop_event.set()
         self.network_test_server_stop_event.set()
-        self.network_test_discovery_stop_event.set()
+        tests.stop_network_test_discovery_listener(self.network_test_discovery_stop_event) # Also wakes it from select() at once
         self.cancel_transfer_event.set()
-        self.cancel_test_event.set()
+        tests.cancel_test(self.cancel_test_event) # Also wakes a network test sender waiting for socket buffer space
 
         # Attempt to unblock blocking network calls using temporary connections
         # This is crucial for threads blocked on socket.accept() or socket.recv() with None timeout.
@@ -1170,7 +1170,7 @@ class Application:
 
 
         # Manually reset state flags for UI clarity if needed (though they should be reset by finally blocks)
-        # Adding a small delay before destroying GUI might help daemon threads finish cleanup
+        # Adding a small delay before destroying GUI might help daemon threads (including the tests.py test task pool) finish cleanup
         print("DEBUG: Giving daemon threads a moment to shut down gracefully after receiving stop signals...")
         time.sleep(0.2) # Slightly increased delay to allow more graceful shutdown
 
@@ -1196,7 +1196,7 @@ class Application:
              print("DEBUG: root window did not exist or was already destroyed.")
 
         # In a simple script, sys.exit(0) can be used to force exit if daemon threads are still stuck,
-        # but ideally, root.destroy() and daemon=True should be enough for most cases.
+        # but ideally, root.destroy() and daemon threads (tests.py runs its test tasks on a daemon worker pool) should be enough for most cases.
         # sys.exit(0) # Use with caution if needed
 
     def run(self):
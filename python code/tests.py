@@ -5,130 +5,333 @@ import os
 import threading
 import time
 import math
+import mmap
 import sys
 import random
+import queue
+import re
+import concurrent.futures
+import selectors
+import struct
+import tempfile
 
 # Import configuration and utilities (using absolute imports)
 import config
 import utils
 
+
+class _DaemonThreadPool:
+    """
+    Minimal thread pool whose workers are daemon threads, like the one-thread-per-task code it replaces.
+    concurrent.futures.ThreadPoolExecutor workers are not daemon and are joined at interpreter exit, so a task
+    still blocked in a socket or file call when the window closes would keep the process alive.
+    Workers are started on demand (up to max_workers) and reused; submit() returns a concurrent.futures.Future.
+    """
+    __slots__ = ('max_workers', 'thread_name_prefix', '_work_queue', '_idle_workers', '_workers_lock', '_worker_count')
+
+    def __init__(self, max_workers, thread_name_prefix):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._work_queue = queue.SimpleQueue()
+        self._idle_workers = threading.Semaphore(0) # Released by a worker each time it finishes a task
+        self._workers_lock = threading.Lock()
+        self._worker_count = 0
+
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        self._work_queue.put((future, fn, args))
+        # Hand the task to an idle worker if there is one, otherwise start another worker while below max_workers
+        if not self._idle_workers.acquire(blocking=False):
+            with self._workers_lock:
+                if self._worker_count < self.max_workers:
+                    self._worker_count += 1
+                    threading.Thread(target=self._worker, name=f"{self.thread_name_prefix}_{self._worker_count}", daemon=True).start()
+        return future
+
+    def _worker(self):
+        while True:
+            future, fn, args = self._work_queue.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            del future, fn, args # Don't keep the finished task's arguments alive while idle
+            self._idle_workers.release()
+
 # --- Drive Test Functions (Run in threads) ---
 
-def run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event):
-    """ Thread task to perform a local write speed test """
+# Random test data shared by all drive tests, generated once per process instead of on every test run
+_DATA_POOL_SIZE = 4 * 1024 * 1024 # Cap the pool at 4MB, larger buffers repeat it
+_DATA_POOL = None
+_DATA_POOL_LOCK = threading.Lock()
+
+
+def _get_test_data_pool():
+    """ Returns the shared block of random (incompressible) test data, creating it on first use """
+    global _DATA_POOL
+    with _DATA_POOL_LOCK:
+        if _DATA_POOL is None:
+            print(f"DEBUG: Generating {utils.format_bytes(_DATA_POOL_SIZE)} test data pool")
+            # Content only needs to be incompressible, not cryptographically random: Mersenne Twister is much faster than os.urandom
+            _DATA_POOL = random.randbytes(_DATA_POOL_SIZE)
+        return _DATA_POOL
+
+
+# Speed label prefixes of the drive tests ("<label>: <speed>")
+_WRITE_SPEED_LABEL = "سرعت نوشتن"
+_READ_SPEED_LABEL = "سرعت خواندن"
+
+
+def _progress_reporter_task(progress_q, gui_callbacks, total_bytes, speed_label):
+    """ Thread task that turns (bytes_done, timestamp) samples from a drive test I/O loop into progress/speed GUI updates """
+    # Bind the per-sample lookups to locals once
+    get_sample = progress_q.get
+    update_progress = gui_callbacks['update_progress']
+    update_speed = gui_callbacks['update_speed']
+    format_speed = utils.format_bytes_per_second
+
+    last_bytes, last_time = get_sample() # First sample is the starting point
+    while True:
+        sample = get_sample()
+        if sample is None: break # Stop signal from the I/O thread
+        bytes_done, sample_time = sample
+
+        progress = (bytes_done / total_bytes) * 100 if total_bytes > 0 else 0
+        update_progress(progress)
+
+        time_delta = sample_time - last_time
+        speed_bps = (bytes_done - last_bytes) / time_delta if time_delta > 0 else 0
+        update_speed(f"{speed_label}: {format_speed(speed_bps)}")
+
+        last_bytes, last_time = bytes_done, sample_time
+
+
+def _start_progress_reporter(gui_callbacks, total_bytes, speed_label, start_time):
+    """ Starts the progress reporter thread, returns (queue, thread). The I/O loop only puts samples on the queue. """
+    progress_q = queue.SimpleQueue()
+    progress_q.put_nowait((0, start_time))
+    reporter = threading.Thread(target=_progress_reporter_task, args=(progress_q, gui_callbacks, total_bytes, speed_label), daemon=True)
+    reporter.start()
+    return progress_q, reporter
+
+
+def _stop_progress_reporter(progress_q, reporter):
+    """ Stops the progress reporter thread (if running) after it has forwarded all queued samples """
+    if reporter is not None and reporter.is_alive():
+        progress_q.put_nowait(None)
+        reporter.join()
+
+
+def _trim_iovecs(iovecs, length):
+    """ Returns views over the first 'length' bytes of a list of buffers (for a short final preadv) """
+    trimmed = []
+    for iov in iovecs:
+        if length <= 0: break
+        trimmed.append(iov[:length])
+        length -= len(iov)
+    return trimmed
+
+
+def _align_buffer_to_block_size(buffer_size, test_file_path, gui_callbacks):
+    """ Rounds buffer_size down to a multiple of the file system block size (at least one block) so each read/write covers whole blocks """
+    try:
+        block_size = os.statvfs(os.path.dirname(os.path.abspath(test_file_path)) or '.').f_bsize
+    except (AttributeError, OSError): # os.statvfs is not available on Windows
+        block_size = 4096
+    if block_size <= 0: block_size = 4096
+
+    effective_buffer_size = max(block_size, (buffer_size // block_size) * block_size)
+    if effective_buffer_size != buffer_size:
+        gui_callbacks['update_status'](f"[!] هشدار: اندازه بافر {utils.format_bytes(buffer_size)} مضربی از اندازه بلاک درایو ({utils.format_bytes(block_size)}) نیست. از بافر {utils.format_bytes(effective_buffer_size)} استفاده می‌شود.")
+        print(f"DEBUG: Buffer size {buffer_size} aligned to {effective_buffer_size} (block size {block_size})")
+    return effective_buffer_size
+
+
+def run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event, direct_io=False):
+    """
+    Thread task to perform a local write speed test.
+    If direct_io is True and the platform supports O_DIRECT (Linux), the test file is written
+    bypassing the OS page cache so the measured speed reflects the drive rather than RAM.
+    Falls back to normal buffered writes if O_DIRECT is unavailable or rejected by the file system.
+    """
     print("DEBUG: run_write_speed_test started")
+    update_status_cb, update_progress_cb, update_speed_cb, show_info_cb, show_error_cb = utils.get_gui_callbacks(
+        gui_callbacks, 'update_status', 'update_progress', 'update_speed', 'show_info', 'show_error')
     test_file_path = config.TEST_FILE_NAME
     bytes_to_write = config.TEST_FILE_SIZE
+    buffer_size = _align_buffer_to_block_size(buffer_size, test_file_path, gui_callbacks)
 
-    # gui_callbacks['update_progress'](0) # Initial update is done in wrapper/caller
-    # gui_callbacks['update_speed']("Speed: 0 B/s") # Initial update is done in wrapper/caller
+    # update_progress_cb(0) # Initial update is done in wrapper/caller
+    # update_speed_cb("Speed: 0 B/s") # Initial update is done in wrapper/caller
 
     written_bytes = 0
     is_cancelled = False
-    data = None
+    progress_q, reporter = None, None
+    direct_buffer = None # Aligned O_DIRECT write buffer (mmap), closed in finally
 
     try:
-        print(f"DEBUG: Generating dummy data for write test with chunk size {utils.format_bytes(buffer_size)}...")
-        # Ensure buffer size is not excessively large for os.urandom
-        # If buffer_size is very large, generating it all at once might consume too much memory.
-        # A safer approach is to generate data in smaller chunks if buffer_size > allocated_chunk_size.
-        allocated_chunk_size = min(buffer_size, 4 * 1024 * 1024) # Cap allocation size to 4MB to avoid excessive memory use
-        try: data = os.urandom(allocated_chunk_size)
-        except NotImplementedError:
-             print("DEBUG: os.urandom not available, using repeating pattern for dummy data.", file=sys.stderr)
-             data = b'\xAA' * allocated_chunk_size
-
-        if not data:
-            # Fallback if even small allocation failed
-            print("DEBUG: Failed to generate any dummy data, using a minimal byte.", file=sys.stderr)
-            data = b'\x00'
-            allocated_chunk_size = 1
-            if buffer_size > 1:
-                 gui_callbacks['update_status'](f"[!] هشدار: قادر به تولید داده تست بافر با اندازه {utils.format_bytes(buffer_size)} نبود. از بافر ۱ بایتی استفاده می‌شود.")
+        print(f"DEBUG: Preparing dummy data for write test with chunk size {utils.format_bytes(buffer_size)}...")
+        data = _get_test_data_pool() # Shared random data, reused across test runs
+        allocated_chunk_size = min(buffer_size, len(data))
 
+        update_status_cb(f"[*] تست نوشتن با بافر {utils.format_bytes(buffer_size)} و حجم {utils.format_bytes(bytes_to_write)} اجرا می‌شود.")
 
-        gui_callbacks['update_status'](f"[*] تست نوشتن با بافر {utils.format_bytes(buffer_size)} و حجم {utils.format_bytes(bytes_to_write)} اجرا می‌شود.")
+        # Prepare one full-size chunk up front so the loop only slices it (no per-chunk allocation or copying).
+        # If the requested size is > allocated size, repeat 'data' once here, outside the loop.
+        if buffer_size > allocated_chunk_size:
+            chunk_view = memoryview((data * (buffer_size // allocated_chunk_size + 1))[:buffer_size])
+        else:
+            chunk_view = memoryview(data)[:buffer_size]
+
+        # Optional O_DIRECT mode: needs an aligned buffer address (anonymous mmap is page-aligned)
+        # and write lengths that are a multiple of the device sector size.
+        f = None
+        write_alignment = 1 # Buffered writes need no alignment
+        write_chunk_size = buffer_size
+        if direct_io and hasattr(os, 'O_DIRECT'):
+            fd = None
+            try:
+                fd = os.open(test_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+                f = open(fd, "wb", buffering=0) # Raw file object, writes go straight to os.write()
+                write_alignment = config.DIRECT_IO_ALIGNMENT
+                direct_chunk_size = -(-buffer_size // write_alignment) * write_alignment # Round up to the alignment
+                direct_buffer = mmap.mmap(-1, direct_chunk_size)
+                direct_buffer[:buffer_size] = chunk_view
+                chunk_view = memoryview(direct_buffer)
+                write_chunk_size = direct_chunk_size # Every chunk except the last must be aligned too
+                update_status_cb("[*] تست نوشتن بدون حافظه کش سیستم عامل (O_DIRECT) اجرا می‌شود.")
+                print(f"DEBUG: Write test using O_DIRECT with {direct_chunk_size} byte aligned buffer")
+            except OSError as e:
+                # e.g. file systems like tmpfs reject O_DIRECT; fall back to buffered writes
+                print(f"DEBUG: O_DIRECT not usable for write test ({e}), falling back to buffered writes.", file=sys.stderr)
+                if f: f.close() # Also closes fd
+                elif fd is not None: os.close(fd) # open() failed after os.open() succeeded
+                f = None
+                if direct_buffer is not None:
+                    direct_buffer.close()
+                    direct_buffer = None
+                write_alignment = 1
+                write_chunk_size = buffer_size
+        if f is None:
+            f = open(test_file_path, "wb")
+
+        # Preallocate the whole file before timing so extent allocation/metadata updates are not measured
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(f.fileno(), 0, bytes_to_write)
+            else:
+                f.truncate(bytes_to_write)
+                f.seek(0)
+        except OSError as e:
+            print(f"DEBUG: Could not preallocate write test file ({e}), continuing without preallocation.", file=sys.stderr)
 
-        start_time = time.time()
+        update_speed_cb("Speed: 0 B/s") # Start speed display here
+        start_time = time.monotonic()
         last_update_time = start_time
-        last_update_bytes = 0
-        gui_callbacks['update_speed']("Speed: 0 B/s") # Start speed display here
+        chunks_per_time_check = max(1, (1 << 20) // write_chunk_size) # Look at the clock roughly once per MiB, not on every chunk
+        chunks_since_time_check = 0
+        progress_q, reporter = _start_progress_reporter(gui_callbacks, bytes_to_write, _WRITE_SPEED_LABEL, start_time) # GUI updates happen off the I/O thread
+        # Locals for the per-chunk calls (LOAD_FAST instead of global/attribute lookups)
+        cancel_requested = cancel_test_event.is_set
+        monotonic = time.monotonic
+        put_sample = progress_q.put_nowait
+        speed_update_interval = config.SPEED_UPDATE_INTERVAL
 
         # Use 'with' statement for guaranteed file closing
-        with open(test_file_path, "wb") as f:
+        with f:
             while written_bytes < bytes_to_write:
-                if cancel_test_event.is_set():
+                if cancel_requested():
                     is_cancelled = True
                     print("DEBUG: Write test cancelled by user")
-                    gui_callbacks['update_status']("[*] تست نوشتن توسط کاربر لغو شد.")
+                    update_status_cb("[*] تست نوشتن توسط کاربر لغو شد.")
                     break
 
-                bytes_to_write_now = min(buffer_size, bytes_to_write - written_bytes) # Use the requested buffer_size for chunking
+                bytes_to_write_now = min(write_chunk_size, bytes_to_write - written_bytes) # Use the requested buffer_size (aligned for O_DIRECT) for chunking
                 if bytes_to_write_now <= 0: break # Finished or nothing left to write (should only happen if bytes_to_write was 0)
 
-                # Prepare the chunk to write. If requested size is > allocated size, repeat allocated data.
-                chunk_to_write = b""
-                remaining_in_chunk = bytes_to_write_now
-                # This loop efficiently creates a chunk of size bytes_to_write_now by repeating 'data'
-                # It avoids creating a huge intermediate byte object if data is small but buffer_size is large.
-                while remaining_in_chunk > 0:
-                    bytes_from_data = min(remaining_in_chunk, allocated_chunk_size)
-                    chunk_to_write += data[:bytes_from_data]
-                    remaining_in_chunk -= bytes_from_data
-
-
                 try:
-                    # Write the prepared chunk
-                    f.write(chunk_to_write)
+                    if bytes_to_write_now == write_chunk_size:
+                        # Common case: a full chunk, write the prepared view as is (no slice object per write)
+                        if f.write(chunk_view) != write_chunk_size:
+                            raise OSError(f"Short write to test file ({write_chunk_size} bytes requested)")
+                    elif write_alignment > 1:
+                        # O_DIRECT: pad the final short chunk up to the alignment, the file is truncated after the loop
+                        write_len = -(-bytes_to_write_now // write_alignment) * write_alignment
+                        if f.write(chunk_view[:write_len]) != write_len:
+                            raise OSError(f"Short write to test file ({write_len} bytes requested)")
+                    else:
+                        f.write(chunk_view[:bytes_to_write_now]) # Final short chunk: zero-copy slice of the prepared chunk
                 except Exception as e:
-                    gui_callbacks['update_status'](f"[!] خطای نوشتن در فایل تست '{test_file_path}': {e}")
+                    update_status_cb(f"[!] خطای نوشتن در فایل تست '{test_file_path}': {e}")
                     print(f"DEBUG: Error writing to test file '{test_file_path}': {e}", file=sys.stderr)
                     is_cancelled = True
                     break
 
-                written_bytes += len(chunk_to_write) # Add actual bytes written
-
-                current_time = time.time()
-                progress = (written_bytes / bytes_to_write) * 100 if bytes_to_write > 0 else 0
-                gui_callbacks['update_progress'](progress)
+                written_bytes += bytes_to_write_now # Add bytes written
 
-                if current_time - last_update_time >= config.SPEED_UPDATE_INTERVAL:
-                    time_delta = current_time - last_update_time
-                    bytes_since_last_update = written_bytes - last_update_bytes
-                    speed_bps = bytes_since_last_update / time_delta if time_delta > 0 else 0
-                    speed_string = utils.format_bytes_per_second(speed_bps)
-                    gui_callbacks['update_speed'](f"سرعت نوشتن: {speed_string}")
+                chunks_since_time_check += 1
+                if chunks_since_time_check < chunks_per_time_check:
+                    continue
+                chunks_since_time_check = 0
 
+                current_time = monotonic()
+                if current_time - last_update_time >= speed_update_interval:
+                    put_sample((written_bytes, current_time)) # Reporter thread formats and posts it
                     last_update_time = current_time
-                    last_update_bytes = written_bytes
+
+            # Drop any O_DIRECT padding written with the final chunk
+            if write_alignment > 1 and not is_cancelled and bytes_to_write % write_alignment:
+                f.truncate(bytes_to_write)
 
             # Check if the loop completed fully (all bytes written)
             if not is_cancelled and written_bytes < bytes_to_write:
                  # This case shouldn't happen if loop logic is correct and no exceptions occurred
-                 gui_callbacks['update_status'](f"[!] تست نوشتن ناقص ماند ({utils.format_bytes(written_bytes)}/{utils.format_bytes(bytes_to_write)}).")
+                 update_status_cb(f"[!] تست نوشتن ناقص ماند ({utils.format_bytes(written_bytes)}/{utils.format_bytes(bytes_to_write)}).")
                  print("DEBUG: Write test incomplete due to unexpected exit")
                  is_cancelled = True # Mark as cancelled due to incomplete write
 
+            if not is_cancelled:
+                # Force the data out of the page cache so the final figure reflects the drive, not RAM
+                cache_flush_start = time.monotonic()
+                f.flush()
+                if hasattr(os, 'fdatasync'): os.fdatasync(f.fileno())
+                else: os.fsync(f.fileno()) # fdatasync is not available on Windows/macOS
+                end_time = time.monotonic()
+
+        _stop_progress_reporter(progress_q, reporter) # Flush pending samples before the final updates
+
         if not is_cancelled and written_bytes >= bytes_to_write:
-            end_time = time.time()
-            total_time = end_time - start_time
+            update_progress_cb(100)
+            total_time = end_time - start_time # Includes the final sync to disk
             average_speed_bps = written_bytes / total_time if total_time > 0 else 0
             average_speed_string = utils.format_bytes_per_second(average_speed_bps)
-            gui_callbacks['update_status'](f"[+] تست نوشتن کامل شد: {utils.format_bytes(written_bytes)} با موفقیت نوشته شد.")
-            gui_callbacks['update_status'](f"    سرعت میانگین نوشتن: {average_speed_string}")
-            gui_callbacks['show_info']("تست نوشتن کامل شد", f"تست سرعت نوشتن با موفقیت به پایان رسید.\nسرعت میانگین: {average_speed_string}")
+            cached_time = cache_flush_start - start_time # Until the last write returned (data may still be in the cache)
+            cached_speed_bps = written_bytes / cached_time if cached_time > 0 else 0
+            cached_speed_string = utils.format_bytes_per_second(cached_speed_bps)
+            update_status_cb(f"[+] تست نوشتن کامل شد: {utils.format_bytes(written_bytes)} با موفقیت نوشته شد.")
+            update_status_cb(f"    سرعت میانگین نوشتن (ذخیره روی دیسک): {average_speed_string}")
+            update_status_cb(f"    سرعت نوشتن در حافظه کش (قبل از همگام‌سازی با دیسک): {cached_speed_string}")
+            show_info_cb("تست نوشتن کامل شد", f"تست سرعت نوشتن با موفقیت به پایان رسید.\nسرعت میانگین (ذخیره روی دیسک): {average_speed_string}\nسرعت نوشتن در کش: {cached_speed_string}")
             print("DEBUG: Write test completed successfully")
 
 
     except Exception as e:
         # Catch any exception during the process (file opening, writing, etc.)
-        gui_callbacks['update_status'](f"[!] خطایی در حین تست نوشتن رخ داد: {e}")
-        gui_callbacks['show_error']("خطای تست نوشتن", f"خطای غیرمنتظره در حین تست نوشتن:\n{e}")
+        update_status_cb(f"[!] خطایی در حین تست نوشتن رخ داد: {e}")
+        show_error_cb("خطای تست نوشتن", f"خطای غیرمنتظره در حین تست نوشتن:\n{e}")
         print(f"DEBUG: Exception during write test: {e}", file=sys.stderr)
         is_cancelled = True
 
     finally:
         print("DEBUG: run_write_speed_test finally block entered.")
+        _stop_progress_reporter(progress_q, reporter)
+        if direct_buffer is not None:
+            try:
+                chunk_view.release() # The view points into the mmap, which cannot be closed while it is exported
+                direct_buffer.close()
+            except Exception as e:
+                print(f"DEBUG: Error closing O_DIRECT write buffer: {e}", file=sys.stderr)
         # Attempt to clean up the test file if it exists
         try:
             if os.path.exists(test_file_path):
@@ -136,20 +339,16 @@ def run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event):
                 print(f"DEBUG: Test file '{test_file_path}' removed.")
         except Exception as e:
             print(f"DEBUG: Error removing test file '{test_file_path}': {e}", file=sys.stderr)
-            gui_callbacks['update_status'](f"[!] هشدار: قادر به حذف فایل تست '{test_file_path}' نبود: {e}")
+            update_status_cb(f"[!] هشدار: قادر به حذف فایل تست '{test_file_path}' نبود: {e}")
 
         # Return success status (True if not cancelled and all bytes written, False otherwise)
         return not is_cancelled and written_bytes >= bytes_to_write
 
 
-def run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event):
-    """ Thread task to perform a local read speed test """
-    print("DEBUG: run_read_speed_test started")
-    test_file_path = config.TEST_FILE_NAME
-    bytes_to_read = config.TEST_FILE_SIZE
+def _ensure_read_test_file(test_file_path, gui_callbacks, cancel_test_event):
+    """ Makes sure the read test file exists with the configured size, creating it if needed. Returns True if the file is ready. """
     is_cancelled = False
 
-    # Ensure the test file exists and has the correct size, create it if not
     file_exists = os.path.exists(test_file_path)
     file_size_correct = False
     if file_exists:
@@ -159,39 +358,42 @@ def run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event):
     if not file_exists or not file_size_correct:
         gui_callbacks['update_status'](f"[*] فایل تست '{test_file_path}' یافت نشد یا اندازه آن صحیح نیست. در حال ایجاد فایل ({utils.format_bytes(config.TEST_FILE_SIZE)})...")
         print(f"DEBUG: Test file '{test_file_path}' missing or wrong size. Creating...")
-        create_buffer_size = min(buffer_size * 10, 4 * 1024 * 1024) # Use a reasonable buffer for creation, up to 4MB
-        try: dummy_data = os.urandom(create_buffer_size)
-        except NotImplementedError: dummy_data = b'\xAA' * create_buffer_size
+        use_fallocate = not config.TEST_RANDOM_CONTENT and hasattr(os, 'posix_fallocate') # Size the file with one call instead of writing data
 
-        if not dummy_data:
-             print("DEBUG: Failed to generate any dummy data for creation, using minimal byte.", file=sys.stderr)
-             dummy_data = b'\x00'
-             create_buffer_size = 1
-             if buffer_size > 1:
-                  gui_callbacks['update_status'](f"[!] هشدار: قادر به تولید داده برای ایجاد فایل تست بافر با اندازه {utils.format_bytes(buffer_size)} نبود. از بافر ۱ بایتی استفاده می‌شود.")
+        if not use_fallocate:
+            dummy_data = _get_test_data_pool() # Shared random data (4MB creation chunks), reused across test runs
 
         creation_successful = False # Flag to track if creation fully succeeded
         try:
-            with open(test_file_path, "wb") as f:
-                written = 0
-                while written < config.TEST_FILE_SIZE:
-                    if cancel_test_event.is_set():
-                        gui_callbacks['update_status']("[*] ایجاد فایل تست توسط کاربر لغو شد.")
-                        print("DEBUG: Test file creation cancelled")
-                        is_cancelled = True
-                        break
-                    bytes_to_write_now = min(len(dummy_data), config.TEST_FILE_SIZE - written)
-                    if bytes_to_write_now <= 0: break
-
-                    try:
-                         f.write(dummy_data[:bytes_to_write_now])
-                    except Exception as e:
-                         gui_callbacks['update_status'](f"[!] خطای نوشتن در حین ایجاد فایل تست '{test_file_path}': {e}")
-                         print(f"DEBUG: Error writing during test file creation '{test_file_path}': {e}", file=sys.stderr)
-                         is_cancelled = True
-                         break
-
-                    written += bytes_to_write_now
+            if use_fallocate:
+                create_fd = os.open(test_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    os.posix_fallocate(create_fd, 0, config.TEST_FILE_SIZE)
+                finally:
+                    os.close(create_fd)
+                print(f"DEBUG: Test file '{test_file_path}' preallocated with posix_fallocate")
+            else:
+                with open(test_file_path, "wb") as f:
+                    dummy_view = memoryview(dummy_data) # Slicing the view avoids copying the data for each write
+                    written = 0
+                    while written < config.TEST_FILE_SIZE:
+                        if cancel_test_event.is_set():
+                            gui_callbacks['update_status']("[*] ایجاد فایل تست توسط کاربر لغو شد.")
+                            print("DEBUG: Test file creation cancelled")
+                            is_cancelled = True
+                            break
+                        bytes_to_write_now = min(len(dummy_view), config.TEST_FILE_SIZE - written)
+                        if bytes_to_write_now <= 0: break
+
+                        try:
+                             f.write(dummy_view[:bytes_to_write_now])
+                        except Exception as e:
+                             gui_callbacks['update_status'](f"[!] خطای نوشتن در حین ایجاد فایل تست '{test_file_path}': {e}")
+                             print(f"DEBUG: Error writing during test file creation '{test_file_path}': {e}", file=sys.stderr)
+                             is_cancelled = True
+                             break
+
+                        written += bytes_to_write_now
 
             if not is_cancelled:
                  final_size = os.path.getsize(test_file_path) if os.path.exists(test_file_path) else 0
@@ -220,86 +422,143 @@ def run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event):
         if not creation_successful or is_cancelled:
              return False
 
-    gui_callbacks['update_progress'](0)
-    gui_callbacks['update_speed']("Speed: 0 B/s")
+    return True
+
+
+def run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event, test_file_path=None):
+    """ Thread task to perform a local read speed test (on config.TEST_FILE_NAME unless test_file_path is given) """
+    print("DEBUG: run_read_speed_test started")
+    update_status_cb, update_progress_cb, update_speed_cb, show_info_cb, show_warning_cb, show_error_cb = utils.get_gui_callbacks(
+        gui_callbacks, 'update_status', 'update_progress', 'update_speed', 'show_info', 'show_warning', 'show_error')
+    if test_file_path is None: test_file_path = config.TEST_FILE_NAME
+    bytes_to_read = config.TEST_FILE_SIZE
+    buffer_size = _align_buffer_to_block_size(buffer_size, test_file_path, gui_callbacks)
+    is_cancelled = False
+
+    # Ensure the test file exists and has the correct size, create it if not
+    if not _ensure_read_test_file(test_file_path, gui_callbacks, cancel_test_event):
+        return False
+
+    update_progress_cb(0)
+    update_speed_cb("Speed: 0 B/s")
 
     read_bytes = 0
     is_cancelled = False
+    progress_q, reporter = None, None
 
     try:
-        gui_callbacks['update_status'](f"[*] تست خواندن با بافر {utils.format_bytes(buffer_size)} و حجم {utils.format_bytes(bytes_to_read)} اجرا می‌شود.")
-        gui_callbacks['update_progress'](0)
-        gui_callbacks['update_speed']("Speed: 0 B/s")
+        update_status_cb(f"[*] تست خواندن با بافر {utils.format_bytes(buffer_size)} و حجم {utils.format_bytes(bytes_to_read)} اجرا می‌شود.")
+        update_progress_cb(0)
+        update_speed_cb("Speed: 0 B/s")
+
+        # Evict the (possibly just written) test file from the page cache so the test hits the drive, not RAM
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                evict_fd = os.open(test_file_path, os.O_RDONLY)
+                try:
+                    os.fsync(evict_fd) # Dirty pages cannot be dropped, flush them first
+                    os.posix_fadvise(evict_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                finally:
+                    os.close(evict_fd)
+                print("DEBUG: Test file evicted from page cache before read test")
+            except OSError as e:
+                print(f"DEBUG: Could not evict test file from page cache: {e}", file=sys.stderr)
+
+        # Read into preallocated buffers so no new bytes object is created per chunk.
+        # Large buffers are split into 1MB slabs filled by a single os.preadv() call where available.
+        read_slab_size = 1024 * 1024
+        use_preadv = hasattr(os, 'preadv') and buffer_size >= read_slab_size
+        if use_preadv:
+            read_iovecs = [memoryview(bytearray(min(read_slab_size, buffer_size - slab_start))) for slab_start in range(0, buffer_size, read_slab_size)]
+        else:
+            read_view = memoryview(bytearray(buffer_size))
 
-        start_time = time.time()
+        start_time = time.monotonic()
         last_update_time = start_time
-        last_update_bytes = 0
+        chunks_per_time_check = max(1, (1 << 20) // buffer_size) # Look at the clock roughly once per MiB, not on every chunk
+        chunks_since_time_check = 0
+        progress_q, reporter = _start_progress_reporter(gui_callbacks, bytes_to_read, _READ_SPEED_LABEL, start_time) # GUI updates happen off the I/O thread
+        # Locals for the per-chunk calls (LOAD_FAST instead of global/attribute lookups)
+        cancel_requested = cancel_test_event.is_set
+        monotonic = time.monotonic
+        put_sample = progress_q.put_nowait
+        speed_update_interval = config.SPEED_UPDATE_INTERVAL
 
         with open(test_file_path, "rb") as f:
+            if hasattr(os, 'posix_fadvise'):
+                # Done inside the timed section: the prefetch I/O still counts towards the measured speed
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL) # Larger kernel readahead window
+                    os.posix_fadvise(f.fileno(), 0, bytes_to_read, os.POSIX_FADV_WILLNEED) # Let the kernel start prefetching the file now
+                except OSError as e: print(f"DEBUG: posix_fadvise(SEQUENTIAL/WILLNEED) failed: {e}", file=sys.stderr)
+
             while read_bytes < bytes_to_read:
-                if cancel_test_event.is_set():
+                if cancel_requested():
                     is_cancelled = True
                     print("DEBUG: Read test cancelled by user")
-                    gui_callbacks['update_status']("[*] تست خواندن توسط کاربر لغو شد.")
+                    update_status_cb("[*] تست خواندن توسط کاربر لغو شد.")
                     break
 
                 bytes_to_read_now = min(buffer_size, bytes_to_read - read_bytes)
                 if bytes_to_read_now <= 0:
                      break
-                bytes_read_chunk = f.read(bytes_to_read_now)
-                if not bytes_read_chunk:
+                if use_preadv:
+                    iovecs_now = read_iovecs if bytes_to_read_now == buffer_size else _trim_iovecs(read_iovecs, bytes_to_read_now)
+                    bytes_read_count = os.preadv(f.fileno(), iovecs_now, read_bytes) # read_bytes is also the file offset
+                else:
+                    bytes_read_count = f.readinto(read_view[:bytes_to_read_now])
+                if not bytes_read_count:
                     if read_bytes < bytes_to_read:
-                         gui_callbacks['update_status']("[!] پایان غیرمنتظره فایل در حین تست خواندن.")
+                         update_status_cb("[!] پایان غیرمنتظره فایل در حین تست خواندن.")
                          print("DEBUG: Unexpected end of file during read test")
                          is_cancelled = True
                     break
 
-                read_bytes += len(bytes_read_chunk)
-
-                current_time = time.time()
-                progress = (read_bytes / bytes_to_read) * 100 if bytes_to_read > 0 else 0
-                gui_callbacks['update_progress'](progress)
+                read_bytes += bytes_read_count
 
-                if current_time - last_update_time >= config.SPEED_UPDATE_INTERVAL:
-                    time_delta = current_time - last_update_time
-                    bytes_since_last_update = read_bytes - last_update_bytes
-                    speed_bps = bytes_since_last_update / time_delta if time_delta > 0 else 0
-                    speed_string = utils.format_bytes_per_second(speed_bps)
-                    gui_callbacks['update_speed'](f"سرعت خواندن: {speed_string}")
+                chunks_since_time_check += 1
+                if chunks_since_time_check < chunks_per_time_check:
+                    continue
+                chunks_since_time_check = 0
 
+                current_time = monotonic()
+                if current_time - last_update_time >= speed_update_interval:
+                    put_sample((read_bytes, current_time)) # Reporter thread formats and posts it
                     last_update_time = current_time
-                    last_update_bytes = read_bytes
 
             if not is_cancelled and read_bytes < bytes_to_read:
-                 gui_callbacks['update_status'](f"[!] تست خواندن ناقص ماند ({utils.format_bytes(read_bytes)}/{utils.format_bytes(bytes_to_read)}).")
-                 gui_callbacks['show_warning']("هشدار تست", f"تست سرعت خواندن ناقص بود (فقط {utils.format_bytes(read_bytes)} خوانده شد).")
+                 update_status_cb(f"[!] تست خواندن ناقص ماند ({utils.format_bytes(read_bytes)}/{utils.format_bytes(bytes_to_read)}).")
+                 show_warning_cb("هشدار تست", f"تست سرعت خواندن ناقص بود (فقط {utils.format_bytes(read_bytes)} خوانده شد).")
                  print(f"DEBUG: Read test incomplete, read {read_bytes}/{bytes_to_read} bytes")
                  is_cancelled = True
 
+        _stop_progress_reporter(progress_q, reporter) # Flush pending samples before the final updates
 
         if not is_cancelled and read_bytes >= bytes_to_read:
-             end_time = time.time()
+             end_time = time.monotonic()
+             update_progress_cb(100)
              total_time = end_time - start_time
              average_speed_bps = read_bytes / total_time if total_time > 0 else 0
              average_speed_string = utils.format_bytes_per_second(average_speed_bps)
-             gui_callbacks['update_status'](f"[+] تست خواندن کامل شد: {utils.format_bytes(read_bytes)} با موفقیت خوانده شد.")
-             gui_callbacks['update_status'](f"    سرعت میانگین خواندن: {average_speed_string}")
-             gui_callbacks['show_info']("تست خواندن کامل شد", f"تست سرعت خواندن با موفقیت به پایان رسید.\nسرعت میانگین: {average_speed_string}")
+             update_status_cb(f"[+] تست خواندن کامل شد: {utils.format_bytes(read_bytes)} با موفقیت خوانده شد.")
+             update_status_cb(f"    سرعت میانگین خواندن: {average_speed_string}")
+             show_info_cb("تست خواندن کامل شد", f"تست سرعت خواندن با موفقیت به پایان رسید.\nسرعت میانگین: {average_speed_string}")
              print("DEBUG: Read test completed successfully")
 
     except FileNotFoundError:
-        gui_callbacks['update_status'](f"[!] خطای تست خواندن: فایل تست '{test_file_path}' پیدا نشد.")
-        gui_callbacks['show_error']("خطای تست خواندن", f"فایل تست '{test_file_path}' پیدا نشد.\nلطفاً ابتدا تست نوشتن را اجرا کنید یا مطمئن شوید فایل موجود است.")
+        update_status_cb(f"[!] خطای تست خواندن: فایل تست '{test_file_path}' پیدا نشد.")
+        show_error_cb("خطای تست خواندن", f"فایل تست '{test_file_path}' پیدا نشد.\nلطفاً ابتدا تست نوشتن را اجرا کنید یا مطمئن شوید فایل موجود است.")
         print(f"DEBUG: Read test failed, file '{test_file_path}' not found")
         is_cancelled = True
     except Exception as e:
-        gui_callbacks['update_status'](f"[!] خطایی در حین تست خواندن رخ داد: {e}")
-        gui_callbacks['show_error']("خطای تست خواندن", f"خطای غیرمنتظره در حین تست خواندن:\n{e}")
+        update_status_cb(f"[!] خطایی در حین تست خواندن رخ داد: {e}")
+        show_error_cb("خطای تست خواندن", f"خطای غیرمنتظره در حین تست خواندن:\n{e}")
         print(f"DEBUG: Exception during read test: {e}", file=sys.stderr)
         is_cancelled = True
 
     finally:
         print("DEBUG: run_read_speed_test finally block entered.")
+        _stop_progress_reporter(progress_q, reporter)
         return not is_cancelled and read_bytes >= bytes_to_read
 
 
@@ -309,7 +568,7 @@ def run_write_speed_test_wrapper(buffer_size, gui_callbacks, cancel_test_event):
     try:
         gui_callbacks['update_status']("--- شروع تست سرعت نوشتن ---")
         gui_callbacks['on_test_started']('write')
-        test_successful = run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event)
+        test_successful = run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event, direct_io=config.DRIVE_TEST_DIRECT_IO)
         if not test_successful and not cancel_test_event.is_set():
              gui_callbacks['show_warning']("هشدار تست", "تست سرعت نوشتن با خطا پایان یافت.")
 
@@ -348,8 +607,79 @@ def run_read_speed_test_wrapper(buffer_size, gui_callbacks, cancel_test_event):
         gui_callbacks['on_test_sequence_finished']()
 
 
+def _make_parallel_test_callbacks(gui_callbacks):
+    """
+    Returns (write_callbacks, read_callbacks): copies of gui_callbacks for the write and read tests running in parallel,
+    whose progress/speed updates are merged into one display instead of overwriting each other.
+    The progress bar shows the mean of both tests (same file size, so it is the share of all bytes done) and
+    the speed label shows both speeds, each with its own label.
+    """
+    update_progress = gui_callbacks['update_progress']
+    update_speed = gui_callbacks['update_speed']
+    speed_labels = (_WRITE_SPEED_LABEL, _READ_SPEED_LABEL)
+    progress_by_test = dict.fromkeys(speed_labels, 0)
+    speed_text_by_test = {label: f"{label}: 0 B/s" for label in speed_labels}
+    lock = threading.Lock() # Both tests' reporter threads post concurrently; also keeps the posted values in order
+
+    def make_callbacks(speed_label):
+        def update_test_progress(progress):
+            with lock:
+                progress_by_test[speed_label] = progress
+                update_progress(sum(progress_by_test.values()) / len(progress_by_test))
+
+        def update_test_speed(speed_text):
+            if not speed_text.startswith(speed_label):
+                return # Generic texts such as "Speed: 0 B/s" don't say which test they belong to
+            with lock:
+                speed_text_by_test[speed_label] = speed_text
+                update_speed(" | ".join(speed_text_by_test.values()))
+
+        return dict(gui_callbacks, update_progress=update_test_progress, update_speed=update_test_speed)
+
+    return make_callbacks(_WRITE_SPEED_LABEL), make_callbacks(_READ_SPEED_LABEL)
+
+
+def _run_write_and_read_in_parallel(buffer_size, gui_callbacks, cancel_test_event):
+    """ Runs the write test and a read test on a second, pre-created file at the same time. Returns (write_ok, read_ok). """
+    read_file_path = config.PARALLEL_READ_TEST_FILE_NAME
+    gui_callbacks['update_status']("[*] تست نوشتن و خواندن به صورت همزمان اجرا می‌شوند (روی دو فایل جداگانه)...")
+    # Align once here (and warn once): both test files are in the same directory, so the tests' own alignment is then a no-op
+    buffer_size = _align_buffer_to_block_size(buffer_size, config.TEST_FILE_NAME, gui_callbacks)
+    write_callbacks, read_callbacks = _make_parallel_test_callbacks(gui_callbacks)
+
+    # Create the read file up front so its creation does not overlap the timed write
+    if not _ensure_read_test_file(read_file_path, gui_callbacks, cancel_test_event):
+        return False, False
+
+    try:
+        gui_callbacks['on_test_started']('write')
+        gui_callbacks['on_test_started']('read')
+        # The read test runs on a second daemon thread (like the task thread itself, so a stuck test never keeps
+        # the process alive after the window closes), the write test on this thread
+        read_result = []
+        read_thread = threading.Thread(
+            target=lambda: read_result.append(run_read_speed_test(buffer_size, read_callbacks, cancel_test_event, read_file_path)),
+            daemon=True
+        )
+        read_thread.start()
+        write_test_successful = run_write_speed_test(buffer_size, write_callbacks, cancel_test_event, config.DRIVE_TEST_DIRECT_IO)
+        read_thread.join()
+        read_test_successful = bool(read_result) and read_result[0]
+        gui_callbacks['on_test_finished']('write')
+        gui_callbacks['on_test_finished']('read')
+        return write_test_successful, read_test_successful
+    finally:
+        # The write test removes its own file, the second read file is only needed for this run
+        try:
+            if os.path.exists(read_file_path):
+                os.remove(read_file_path)
+                print(f"DEBUG: Parallel read test file '{read_file_path}' removed.")
+        except Exception as e:
+            print(f"DEBUG: Error removing parallel read test file '{read_file_path}': {e}", file=sys.stderr)
+
+
 def run_all_tests_task(buffer_size, gui_callbacks, cancel_test_event):
-    """ Thread task to run sequential write and read speed tests """
+    """ Thread task to run the write and read speed tests (sequentially, or in parallel if config.PARALLEL_READ_WRITE) """
     print("DEBUG: run_all_tests_task started")
 
     write_test_successful = False
@@ -361,31 +691,37 @@ def run_all_tests_task(buffer_size, gui_callbacks, cancel_test_event):
         gui_callbacks['update_progress'](0)
         gui_callbacks['update_speed']("Speed: Starting Tests...")
 
-        gui_callbacks['update_status']("[*] شروع تست سرعت نوشتن...")
-        gui_callbacks['on_test_started']('write')
-        write_test_successful = run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event)
-        gui_callbacks['on_test_finished']('write')
+        if config.PARALLEL_READ_WRITE:
+            write_test_successful, read_test_successful = _run_write_and_read_in_parallel(buffer_size, gui_callbacks, cancel_test_event)
+            if cancel_test_event.is_set():
+                 gui_callbacks['update_status']("[*] تست کلی توسط کاربر لغو شد.")
+                 is_cancelled_sequence = True
+        else:
+            gui_callbacks['update_status']("[*] شروع تست سرعت نوشتن...")
+            gui_callbacks['on_test_started']('write')
+            write_test_successful = run_write_speed_test(buffer_size, gui_callbacks, cancel_test_event, direct_io=config.DRIVE_TEST_DIRECT_IO)
+            gui_callbacks['on_test_finished']('write')
 
-        if cancel_test_event.is_set():
-             gui_callbacks['update_status']("[*] تست کلی توسط کاربر در مرحله نوشتن لغو شد.")
-             is_cancelled_sequence = True
-        elif not write_test_successful:
-              gui_callbacks['update_status']("[!] تست نوشتن ناموفق بود. تست خواندن اجرا نمی‌شود.")
-              is_cancelled_sequence = True
-
-        if not is_cancelled_sequence:
-             gui_callbacks['update_status']("[*] شروع تست سرعت خواندن...")
-             gui_callbacks['on_test_started']('read')
-             read_test_successful = run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event)
-             gui_callbacks['on_test_finished']('read')
-
-             if cancel_test_event.is_set():
-                  gui_callbacks['update_status']("[*] تست کلی توسط کاربر در مرحله خواندن لغو شد.")
-                  is_cancelled_sequence = True
-             elif not read_test_successful:
-                  gui_callbacks['update_status']("[!] تست خواندن ناموفق بود.")
+            if cancel_test_event.is_set():
+                 gui_callbacks['update_status']("[*] تست کلی توسط کاربر در مرحله نوشتن لغو شد.")
+                 is_cancelled_sequence = True
+            elif not write_test_successful:
+                  gui_callbacks['update_status']("[!] تست نوشتن ناموفق بود. تست خواندن اجرا نمی‌شود.")
                   is_cancelled_sequence = True
 
+            if not is_cancelled_sequence:
+                 gui_callbacks['update_status']("[*] شروع تست سرعت خواندن...")
+                 gui_callbacks['on_test_started']('read')
+                 read_test_successful = run_read_speed_test(buffer_size, gui_callbacks, cancel_test_event)
+                 gui_callbacks['on_test_finished']('read')
+
+                 if cancel_test_event.is_set():
+                      gui_callbacks['update_status']("[*] تست کلی توسط کاربر در مرحله خواندن لغو شد.")
+                      is_cancelled_sequence = True
+                 elif not read_test_successful:
+                      gui_callbacks['update_status']("[!] تست خواندن ناموفق بود.")
+                      is_cancelled_sequence = True
+
         if is_cancelled_sequence:
              gui_callbacks['update_status']("[*] تست سرعت کلی لغو شد یا کامل نشد.")
              print("DEBUG: All tests sequence cancelled or failed.")
@@ -415,27 +751,145 @@ def run_all_tests_task(buffer_size, gui_callbacks, cancel_test_event):
 
 # --- Network Test Server Functions (Run in threads) ---
 
+def _read_proc_int(path):
+    """ Reads an integer from a /proc or /sys file (Linux), returns None if unavailable """
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _tune_network_test_socket(sock, buffer_size):
+    """ Enlarges the kernel socket buffers of an accepted network test socket (clamped to the system maximum) """
+    wanted_size = buffer_size * config.NETWORK_TEST_SOCKET_BUFFER_FACTOR
+    for option, max_path in ((socket.SO_RCVBUF, "/proc/sys/net/core/rmem_max"), (socket.SO_SNDBUF, "/proc/sys/net/core/wmem_max")):
+        size = wanted_size
+        system_max = _read_proc_int(max_path)
+        if system_max: size = min(size, system_max)
+        try: sock.setsockopt(socket.SOL_SOCKET, option, size)
+        except OSError as e: print(f"DEBUG: Could not set socket buffer option {option} to {size}: {e}", file=sys.stderr)
+    print(f"DEBUG: Network test socket buffers requested {wanted_size} bytes, kernel RCVBUF now {sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}")
+
+
+_SIOCGIFADDR = 0x8915 # Linux ioctl: get the IPv4 address of an interface
+_SIOCGIFBRDADDR = 0x8919 # Linux ioctl: get the IPv4 broadcast address of an interface
+
+
+def _get_interface_ipv4(probe_socket, interface_name, request):
+    """ Returns the IPv4 address an SIOCGIF* ioctl reports for an interface, or None (Linux only) """
+    import fcntl # Unix only
+    try:
+        ifreq = fcntl.ioctl(probe_socket.fileno(), request, struct.pack('256s', interface_name.encode('utf-8')[:15]))
+    except OSError:
+        return None # No IPv4 address (or no broadcast address) on this interface
+    return socket.inet_ntoa(ifreq[20:24])
+
+
+def _parse_cpu_list(cpu_list):
+    """ Parses a sysfs CPU list such as "0-7,16-23" into a set of CPU numbers """
+    cpus = set()
+    for part in cpu_list.strip().split(','):
+        if not part: continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _pin_thread_to_nic_numa_node(local_ip):
+    """ Restricts the calling thread to the CPUs of the NUMA node of the NIC that owns local_ip (Linux only).
+    Returns the previous CPU affinity to restore afterwards, or None if nothing was changed """
+    if not sys.platform.startswith('linux') or not hasattr(os, 'sched_setaffinity'):
+        return None
+    probe_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        interface_name = next((name for _, name in socket.if_nameindex()
+                               if _get_interface_ipv4(probe_socket, name, _SIOCGIFADDR) == local_ip), None)
+    except OSError:
+        interface_name = None
+    finally:
+        probe_socket.close()
+    if interface_name is None:
+        return None
+    numa_node = _read_proc_int(f"/sys/class/net/{interface_name}/device/numa_node")
+    if numa_node is None or numa_node < 0: # Virtual interface, or a single-node system (-1)
+        print(f"DEBUG: No NUMA node known for network interface {interface_name}, not pinning the test thread")
+        return None
+    try:
+        with open(f"/sys/devices/system/node/node{numa_node}/cpulist") as f:
+            node_cpus = _parse_cpu_list(f.read())
+        previous_affinity = os.sched_getaffinity(0)
+        node_cpus &= previous_affinity # Stay within the CPUs this process may use
+        if not node_cpus or node_cpus == previous_affinity:
+            return None
+        os.sched_setaffinity(0, node_cpus) # 0 = the calling thread on Linux
+    except (OSError, ValueError) as e:
+        print(f"DEBUG: Could not pin network test thread to NUMA node {numa_node}: {e}", file=sys.stderr)
+        return None
+    print(f"DEBUG: Network test thread pinned to CPUs {sorted(node_cpus)} (NUMA node {numa_node} of {interface_name})")
+    return previous_affinity
+
+
+# Network test header: NET_TEST_START|<test size>|<sender buffer size>, followed directly by the test data
+# (prefix and separator are encoded once here, not per connection)
+_NET_TEST_PREFIX_BYTES = config.NETWORK_TEST_PROTOCOL_HEADER.encode('utf-8')
+_NET_TEST_SEPARATOR_BYTES = config.HEADER_SEPARATOR.encode('utf-8')
+_NET_TEST_HEADER_RE = re.compile(
+    re.escape(_NET_TEST_PREFIX_BYTES) + re.escape(_NET_TEST_SEPARATOR_BYTES)
+    + rb'(\d+)' + re.escape(_NET_TEST_SEPARATOR_BYTES) + rb'(\d+)'
+)
+# Sender side: everything up to the buffer size is fixed by config, only the buffer size is appended per test
+_NET_TEST_CLIENT_HEADER_PREFIX = _NET_TEST_PREFIX_BYTES + _NET_TEST_SEPARATOR_BYTES + b"%d" % config.NETWORK_TEST_SIZE + _NET_TEST_SEPARATOR_BYTES
+_NET_TEST_SIZE_TEXT = utils.format_bytes(config.NETWORK_TEST_SIZE) # For status messages
+
+# Results of _scan_network_test_header
+_HEADER_NEED_MORE = 0
+_HEADER_PARSED = 1
+_HEADER_ERROR = 2
+
+
+def _scan_network_test_header(header_buffer, scan_offset, max_header_size):
+    """ Looks for the network test header in the bytes received so far, without raising.
+    Returns (_HEADER_PARSED, match), (_HEADER_NEED_MORE, next scan offset) or (_HEADER_ERROR, message) """
+    # Look for "PREFIX|testsize|buffersize" from the scan offset on (leading garbage is skipped)
+    header_match = _NET_TEST_HEADER_RE.search(header_buffer, scan_offset)
+    if header_match:
+        return _HEADER_PARSED, header_match
+    if len(header_buffer) >= max_header_size: # Safety limit
+        return _HEADER_ERROR, "Network test header buffer size exceeded limit during header read."
+    # Not complete yet: resume at the prefix if it has arrived, otherwise only the tail could still start it
+    prefix_index = header_buffer.find(_NET_TEST_PREFIX_BYTES, scan_offset)
+    if prefix_index != -1:
+        return _HEADER_NEED_MORE, prefix_index
+    return _HEADER_NEED_MORE, max(scan_offset, len(header_buffer) - len(_NET_TEST_PREFIX_BYTES) + 1)
+
+
 def handle_network_test_client(client_socket, address, gui_callbacks, cancel_test_event, receive_buffer_size_for_recv):
     """ Thread task to manage network test client connection and receive test data """
     # receive_buffer_size_for_recv: This is the buffer size the RECEIVER (this side) will use for socket.recv().
     print(f"DEBUG: handle_network_test_client started for {address}")
+    update_status_cb, update_progress_cb, update_speed_cb, show_info_cb, show_error_cb = utils.get_gui_callbacks(
+        gui_callbacks, 'update_status', 'update_progress', 'update_speed', 'show_info', 'show_error')
 
-    # gui_callbacks['update_status'](f"[+] اتصال جدید تست شبکه از {address}") # Initial status done by server task
-    gui_callbacks['update_speed']("Speed: Receiving Test Data...")
-    gui_callbacks['update_progress'](0) # Ensure progress is 0
+    # update_status_cb(f"[+] اتصال جدید تست شبکه از {address}") # Initial status done by server task
+    update_speed_cb("Speed: Receiving Test Data...")
+    update_progress_cb(0) # Ensure progress is 0
 
     bytes_to_receive = 0
     buffer_size_from_header = 4096 # Buffer size announced by sender (for info/log)
     received_bytes = 0
     is_cancelled = False
+    recv_selector = None
+    previous_cpu_affinity = None
 
     try: # Outer try block covering header parsing and data receive
-        client_socket.settimeout(10.0) # Timeout for initial header receive attempt
-        header_buffer = b""
-        header_sep_bytes = config.HEADER_SEPARATOR.encode('utf-8')
-        header_expected_prefix_bytes = config.NETWORK_TEST_PROTOCOL_HEADER.encode('utf-8') # Prefix bytes without separator
-        prefix_with_sep_bytes = header_expected_prefix_bytes + header_sep_bytes # Prefix followed by a separator
-        min_separators_needed_after_prefix = 2 # Need testsize|buffersize after prefix
+        if config.NETWORK_TEST_PIN_TO_NIC_NUMA_NODE:
+            previous_cpu_affinity = _pin_thread_to_nic_numa_node(client_socket.getsockname()[0])
+
+        # Short timeout for the header reads so the cancel event and the overall header timeout are checked regularly
+        client_socket.settimeout(config.CANCEL_CHECK_INTERVAL)
+        header_buffer = bytearray() # Grows in place, avoids re-copying the whole header on every chunk
+        header_scan_offset = 0 # Bytes before this offset are known not to start the header, they are never rescanned
         max_header_read_buffer = config.BUFFER_SIZE_FOR_HEADER * 4 # Safety limit for header buffer
 
 
@@ -445,7 +899,7 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
 
         while not header_fully_parsed:
             if cancel_test_event.is_set():
-                gui_callbacks['update_status']("[*] دریافت تست شبکه توسط کاربر لغو شد.")
+                update_status_cb("[*] دریافت تست شبکه توسط کاربر لغو شد.")
                 is_cancelled = True
                 print("DEBUG: Network test receive cancelled during header receive")
                 break # Exit header reading loop
@@ -456,15 +910,8 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
 
 
             try:
-                client_socket.settimeout(config.CANCEL_CHECK_INTERVAL)
-                chunk_size_to_read = config.BUFFER_SIZE_FOR_HEADER if len(header_buffer) == 0 else min(4096, config.BUFFER_SIZE_FOR_HEADER) # Read smaller chunks once buffer has content
-                 # Don't read more than max_header_read_buffer into the buffer
-                chunk_size_to_read = min(chunk_size_to_read, max_header_read_buffer - len(header_buffer))
-                if chunk_size_to_read <= 0:
-                    raise ValueError("Network test header buffer already at max size, header not found.")
-
-                chunk = client_socket.recv(chunk_size_to_read)
-                client_socket.settimeout(10.0)
+                # Don't read more than max_header_read_buffer into the buffer (the scan below stops at the limit)
+                chunk = client_socket.recv(min(config.BUFFER_SIZE_FOR_HEADER, max_header_read_buffer - len(header_buffer)))
             except socket.timeout:
                 continue
             except Exception as e:
@@ -474,105 +921,22 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
                  if len(header_buffer) == 0: raise ConnectionResetError("Connection closed by peer before network test header receive.")
                  else: raise ValueError("Connection closed by peer during network test header receive.")
 
-            header_buffer += chunk
-
-            # Check if we have the expected prefix followed by a separator, and enough separators *after* that.
-            # --- FIX START: More robust header prefix and separator finding ---
-            prefix_and_first_sep_index = header_buffer.find(prefix_with_sep_bytes)
-
-            if prefix_and_first_sep_index != -1: # Found "PREFIX|"
-                # Calculate index *after* the first separator
-                after_first_sep_index = prefix_and_first_sep_index + len(prefix_with_sep_bytes)
-
-                # Check if there are enough separators remaining in the buffer after the first one
-                if header_buffer[after_first_sep_index:].count(header_sep_bytes) >= min_separators_needed_after_prefix -1: # Need 1 more separator after first one
-
-                    try:
-                         # Find the position of the second separator *after* the first one
-                         idx2_bytes = header_buffer.find(header_sep_bytes, after_first_sep_index)
-
-                         if idx2_bytes != -1: # Found "PREFIX|TESTSIZE|"
-                              # Extract the relevant bytes for testsize and buffersize based on byte indices
-                              # Testsize bytes are between the first and second separator
-                              testsize_bytes_raw = header_buffer[after_first_sep_index : idx2_bytes]
-                              # Buffersize bytes plus data are after the second separator
-                              buffersize_bytes_raw_plus_data = header_buffer[idx2_bytes + len(header_sep_bytes) :]
-
-                              # Decode raw bytes for parsing (ignore errors)
-                              testsize_str = testsize_bytes_raw.decode('utf-8', errors='ignore').strip() # Strip whitespace
-                              buffersize_str_plus_data = buffersize_bytes_raw_plus_data.decode('utf-8', errors='ignore')
-
-                              # Attempt parsing testsize
-                              parsed_testsize = int(testsize_str) # Will raise ValueError if not int
-
-                              # Attempt parsing buffersize - extract only leading digits from decoded string
-                              buffersize_digits = ""
-                              for char in buffersize_str_plus_data:
-                                  if char.isdigit():
-                                       buffersize_digits += char
-                                  else:
-                                       break # Stop at the first non-digit
-
-                              if not buffersize_digits:
-                                  # Buffersize part didn't start with digits or was empty, malformed header
-                                  raise ValueError("Network test buffer size part does not start with digits or is empty.")
-
-                              parsed_buffersize = int(buffersize_digits) # Will raise ValueError if not int if digits found
-
-                              # If parsing is successful, the header structure is valid.
-                              # Construct the exact header string based on parsed values.
-                              exact_header_str = f"{config.NETWORK_TEST_PROTOCOL_HEADER}{config.HEADER_SEPARATOR}{testsize_str}{config.HEADER_SEPARATOR}{buffersize_digits}"
-                              exact_header_bytes = exact_header_str.encode('utf-8')
-
-                              # Find the exact bytes of the constructed header in the original buffer
-                              # Search from the beginning of the buffer
-                              header_start_index = header_buffer.find(exact_header_bytes)
-
-                              if header_start_index != -1: # Found the exact header bytes
-                                  # Found the exact header bytes! This is the end of the header in the buffer.
-                                  # Set main header variables and remaining buffer.
-                                  bytes_to_receive = parsed_testsize
-                                  buffer_size_from_header = parsed_buffersize # Store for info, actual recv buffer is receiver side
-                                  # Remaining buffer is from the end of the exact header bytes
-                                  remaining_buffer = header_buffer[header_start_index + len(exact_header_bytes):]
-                                  # header_data = exact_header_str # Store bytes or string for log
-                                  print(f"DEBUG: Network test header successfully parsed and validated: '{exact_header_str}'. Remaining buffer size: {len(remaining_buffer)}")
-                                  gui_callbacks['update_status'](f"[*] فرستنده از بافر با اندازه {utils.format_bytes(buffer_size_from_header)} برای تست استفاده می کند.")
-                                  header_fully_parsed = True # Found header, exit loop
-                              else:
-                                   # Exact bytes not found. Log and keep reading.
-                                   # This can happen if the buffer has leading garbage before the prefix.
-                                   # If prefix_start_index_bytes > 0, we can discard the leading garbage and continue searching.
-                                   if prefix_start_index_bytes > 0:
-                                        print(f"DEBUG: Discarding {prefix_start_index_bytes} leading bytes before network test header prefix.")
-                                        header_buffer = header_buffer[prefix_start_index_bytes:]
-                                   else: # Prefix was at the start, but exact bytes not found - unexpected
-                                        print(f"DEBUG: Found network test header parts based on separators, but could not find exact byte sequence in buffer starting at prefix. Buffer content start: {header_buffer[:50]}... Continuing to receive header data.")
-                                        if len(header_buffer) >= max_header_read_buffer: # Prevent infinite loop
-                                             raise ValueError("Could not find valid network test header pattern in buffer.")
-
-                         # else: Second separator not found after the first one
-
-                    except ValueError as e:
-                           # Catch parsing/validation errors
-                           header_snippet = header_buffer.decode('utf-8', errors='ignore')[:100] # Use buffer snippet for error log
-                           print(f"DEBUG: Network test header parsing error: {e}. Likely malformed header. Decoded buffer start: {header_snippet}... Continuing to receive header data if possible.", file=sys.stderr)
-                           if len(header_buffer) > max_header_read_buffer / 2:
-                               raise ValueError(f"Malformed network test header received during parsing: {e}")
-                    except Exception as e:
-                           # Catch any other unexpected error
-                           header_snippet = header_buffer.decode('utf-8', errors='ignore')[:100]
-                           print(f"DEBUG: Unexpected error during network test header parsing attempt: {e}. Decoded buffer start: {header_snippet}... Continuing to receive header data if possible.", file=sys.stderr)
-                           if len(header_buffer) > max_header_read_buffer / 2:
-                               raise ValueError(f"Unexpected error during network test header parsing: {e}")
-
-            # --- FIX END ---
-
-            # If not fully parsed and buffer isn't excessive, check max buffer size before reading more
-            if not header_fully_parsed and len(header_buffer) > max_header_read_buffer: # Safety limit
-                 raise ValueError("Network test header buffer size exceeded limit during header read.")
+            header_buffer.extend(chunk)
 
-            # If header not fully parsed and buffer isn't excessive, the loop will continue to read more chunks.
+            header_state, header_result = _scan_network_test_header(header_buffer, header_scan_offset, max_header_read_buffer)
+            if header_state == _HEADER_NEED_MORE:
+                header_scan_offset = header_result # Keep reading
+            elif header_state == _HEADER_ERROR:
+                raise ValueError(header_result)
+            else:
+                header_match = header_result
+                bytes_to_receive = int(header_match.group(1))
+                buffer_size_from_header = int(header_match.group(2)) # Store for info, actual recv buffer is receiver side
+                # Anything after the header is already test data
+                remaining_buffer = header_buffer[header_match.end():]
+                print(f"DEBUG: Network test header successfully parsed and validated: '{header_match.group(0).decode('utf-8', errors='ignore')}'. Remaining buffer size: {len(remaining_buffer)}")
+                update_status_cb(f"[*] فرستنده از بافر با اندازه {utils.format_bytes(buffer_size_from_header)} برای تست استفاده می کند.")
+                header_fully_parsed = True # Found header, exit loop
 
 
         # --- If header was successfully found and parsed, proceed ---
@@ -592,14 +956,16 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
 
 
         # --- Network Test Data Receiving ---
-        gui_callbacks['update_status'](f"[*] شروع دریافت داده تست شبکه ({utils.format_bytes(bytes_to_receive)}) از {address}...")
-        gui_callbacks['update_progress'](0)
-        gui_callbacks['update_speed']("Speed: 0 B/s") # Reset speed for data transfer phase
+        update_status_cb(f"[*] شروع دریافت داده تست شبکه ({utils.format_bytes(bytes_to_receive)}) از {address}...")
+        update_progress_cb(0)
+        update_speed_cb("Speed: 0 B/s") # Reset speed for data transfer phase
 
 
-        start_time = time.time()
-        last_update_time = start_time
+        # Integer nanoseconds from the monotonic clock: no NTP jumps and no float math in the loop
+        start_ns = time.monotonic_ns()
+        last_update_ns = start_ns
         last_update_bytes = 0
+        speed_update_interval_ns = int(config.SPEED_UPDATE_INTERVAL * 1_000_000_000)
         print("DEBUG: Starting network test receive loop")
 
         # Process remaining buffer first if any
@@ -611,58 +977,92 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
                  print(f"DEBUG: Processed {bytes_to_process_now} bytes from header buffer for network test.")
              remaining_buffer = b"" # Clear the remaining buffer after using it
 
-        # Use the *receiver's configured buffer size* for recv() calls (passed to handle_client_connection)
-        # This `receive_buffer_size_for_recv` argument comes from the *test* buffer setting in GUI.
-        # It's used here as the buffer size for receiving network test data.
+        # The `receive_buffer_size_for_recv` argument comes from the *test* buffer setting in GUI.
+        # It only sets a lower bound here: for a throughput measurement each recv should drain as much as the kernel
+        # can hold, so the per-call length is at least NETWORK_TEST_MIN_RECV_SIZE and at least the socket's SO_RCVBUF.
         recv_buffer_size_for_loop = receive_buffer_size_for_recv if receive_buffer_size_for_recv is not None and receive_buffer_size_for_recv > 0 else 65536 # Default 64KB if invalid
-
+        try: kernel_rcvbuf_size = client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        except OSError: kernel_rcvbuf_size = 0
+        recv_buffer_size_for_loop = max(recv_buffer_size_for_loop, config.NETWORK_TEST_MIN_RECV_SIZE, kernel_rcvbuf_size)
+        print(f"DEBUG: Network test recv length {recv_buffer_size_for_loop} bytes (GUI test buffer {receive_buffer_size_for_recv}, kernel RCVBUF {kernel_rcvbuf_size})")
+        # Receive into one preallocated buffer, the data is only counted so no per-chunk bytes objects are needed
+        recv_view = memoryview(bytearray(recv_buffer_size_for_loop))
+        # On Linux, MSG_TRUNC on a TCP socket makes the kernel discard the data and only return the byte count,
+        # so the payload is never copied to user space (the view is just a placeholder then)
+        recv_flags = getattr(socket, 'MSG_TRUNC', 0) if sys.platform.startswith('linux') else 0
+
+        # Non-blocking socket + selector: recv_into() is tried directly and we only wait (with the cancel check
+        # interval as timeout) when no data is ready, instead of two settimeout() calls around every recv.
+        client_socket.setblocking(False)
+        recv_selector = selectors.DefaultSelector()
+        recv_selector.register(client_socket, selectors.EVENT_READ)
+
+        chunks_per_time_check = max(1, (1 << 20) // recv_buffer_size_for_loop) # Look at the clock roughly once per MiB, not on every recv
+        chunks_since_time_check = 0
+
+        # Linux only: TCP_QUICKACK makes the receiver ACK immediately instead of using delayed ACKs, so the
+        # sender's window is not held back. The kernel clears it again on its own, so it is re-armed once per MiB below.
+        quickack_option = getattr(socket, 'TCP_QUICKACK', None)
+        if quickack_option is not None:
+            try: client_socket.setsockopt(socket.IPPROTO_TCP, quickack_option, 1)
+            except OSError as e:
+                print(f"DEBUG: Could not set TCP_QUICKACK on network test socket: {e}", file=sys.stderr)
+                quickack_option = None
 
         while received_bytes < bytes_to_receive:
             if cancel_test_event.is_set():
-                gui_callbacks['update_status']("[*] تست شبکه توسط کاربر لغو شد.")
+                update_status_cb("[*] تست شبکه توسط کاربر لغو شد.")
                 is_cancelled = True
                 print("DEBUG: Network test receive cancelled by user")
                 break
 
             try:
-                client_socket.settimeout(config.CANCEL_CHECK_INTERVAL)
                 # Ensure we don't read more bytes than remaining if remaining < buffer size
                 bytes_to_read_now = min(recv_buffer_size_for_loop, bytes_to_receive - received_bytes)
                 if bytes_to_read_now <= 0:
                      # Should only happen if remaining_buffer fulfilled the test size, or test_size was 0
                      break # Exit loop if nothing more to read
 
-                bytes_read_chunk = client_socket.recv(bytes_to_read_now) # Use the receiver's chosen buffer size here
-                client_socket.settimeout(None) # Remove timeout after successful read
-            except socket.timeout:
-                continue # Keep trying to read if timeout is due to CANCEL_CHECK_INTERVAL
+                bytes_read_count = client_socket.recv_into(recv_view, bytes_to_read_now, recv_flags) # Use the receiver's chosen buffer size here
+            except BlockingIOError:
+                recv_selector.select(config.CANCEL_CHECK_INTERVAL) # Wait for data, wake up periodically to check cancel
+                continue
             except Exception as e:
-                gui_callbacks['update_status'](f"[!] خطای خواندن داده تست شبکه از سوکت: {e}")
+                update_status_cb(f"[!] خطای خواندن داده تست شبکه از سوکت: {e}")
                 print(f"DEBUG: Error reading network test data from socket: {e}", file=sys.stderr)
                 is_cancelled = True
                 break
 
-            if not bytes_read_chunk:
-                gui_callbacks['update_status'](f"[!] اتصال با {address} قبل از اتمام دریافت تست شبکه قطع شد.")
+            if not bytes_read_count:
+                update_status_cb(f"[!] اتصال با {address} قبل از اتمام دریافت تست شبکه قطع شد.")
                 print(f"DEBUG: Connection lost during receive from {address}")
                 is_cancelled = True
                 break
 
             # Just count the bytes, don't write them
-            received_bytes += len(bytes_read_chunk)
-
-            current_time = time.time()
-            progress = (received_bytes / bytes_to_receive) * 100 if bytes_to_receive > 0 else 0
-            gui_callbacks['update_progress'](progress)
+            received_bytes += bytes_read_count
 
-            if current_time - last_update_time >= config.SPEED_UPDATE_INTERVAL:
-                time_delta = current_time - last_update_time
-                bytes_since_last_update = received_bytes - last_update_bytes
-                speed_bps = bytes_since_last_update / time_delta if time_delta > 0 else 0
+            chunks_since_time_check += 1
+            if chunks_since_time_check < chunks_per_time_check:
+                continue
+            chunks_since_time_check = 0
+            if quickack_option is not None:
+                try: client_socket.setsockopt(socket.IPPROTO_TCP, quickack_option, 1)
+                except OSError as e: # Stop re-arming; the test itself is unaffected
+                    print(f"DEBUG: Could not re-arm TCP_QUICKACK on network test socket: {e}", file=sys.stderr)
+                    quickack_option = None
+
+            current_ns = time.monotonic_ns()
+            if current_ns - last_update_ns >= speed_update_interval_ns:
+                progress = (received_bytes / bytes_to_receive) * 100 if bytes_to_receive > 0 else 0
+                update_progress_cb(progress)
+
+                # The interval gate above guarantees a positive time delta
+                speed_bps = (received_bytes - last_update_bytes) * 1_000_000_000 // (current_ns - last_update_ns)
                 speed_string = utils.format_bytes_per_second(speed_bps)
-                gui_callbacks['update_speed'](f"سرعت دانلود (دریافت کننده تست): {speed_string}")
+                update_speed_cb(f"سرعت دانلود (دریافت کننده تست): {speed_string}")
 
-                last_update_time = current_time
+                last_update_ns = current_ns
                 last_update_bytes = received_bytes
         print("DEBUG: Network test receive loop finished")
 
@@ -671,20 +1071,20 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
         # Check if loop completed fully without cancellation
         if not is_cancelled and received_bytes < bytes_to_receive:
              # Loop ended prematurely without cancellation and without receiving full data
-             gui_callbacks['update_status'](f"[!] دریافت داده تست شبکه ناقص ماند ({utils.format_bytes(received_bytes)}/{utils.format_bytes(bytes_to_receive)}) از {address}.")
+             update_status_cb(f"[!] دریافت داده تست شبکه ناقص ماند ({utils.format_bytes(received_bytes)}/{utils.format_bytes(bytes_to_receive)}) از {address}.")
              print(f"DEBUG: Network test receive incomplete, received {received_bytes}/{bytes_to_receive} bytes")
              is_cancelled = True # Mark as cancelled due to incomplete receive
 
 
         if not is_cancelled and received_bytes >= bytes_to_receive:
-            end_time = time.time()
-            total_time = end_time - start_time
-            average_speed_bps = received_bytes / total_time if total_time > 0 else 0
+            total_ns = time.monotonic_ns() - start_ns
+            update_progress_cb(100)
+            average_speed_bps = received_bytes * 1_000_000_000 // total_ns if total_ns > 0 else 0
             average_speed_string = utils.format_bytes_per_second(average_speed_bps)
 
-            gui_callbacks['update_status'](f"[+] دریافت داده تست شبکه با موفقیت کامل شد.")
-            gui_callbacks['update_status'](f"    سرعت میانگین دانلود (دریافت کننده تست): {average_speed_string}")
-            gui_callbacks['show_info']("تست شبکه سمت دریافت کننده", f"دریافت داده تست شبکه کامل شد.\nسرعت میانگین دانلود: {average_speed_string}")
+            update_status_cb(f"[+] دریافت داده تست شبکه با موفقیت کامل شد.")
+            update_status_cb(f"    سرعت میانگین دانلود (دریافت کننده تست): {average_speed_string}")
+            show_info_cb("تست شبکه سمت دریافت کننده", f"دریافت داده تست شبکه کامل شد.\nسرعت میانگین دانلود: {average_speed_string}")
             print("DEBUG: Network test data received successfully")
         # else: Status messages handled where break conditions were met
 
@@ -693,21 +1093,28 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
          # Use header_buffer in error message if available and not too long
          header_snippet = header_buffer.decode('utf-8', errors='ignore')[:100] if header_buffer else ""
          msg = f"[!] خطا در ارتباط یا هدر تست شبکه با {address}: {e}"
-         gui_callbacks['update_status'](msg)
-         gui_callbacks['show_error']("خطای دریافت تست شبکه", f"خطا در ارتباط یا هدر تست شبکه از فرستنده ({address}):\n{e}\nهدر دریافتی (بخش اول): {header_snippet}...")
+         update_status_cb(msg)
+         show_error_cb("خطای دریافت تست شبکه", f"خطا در ارتباط یا هدر تست شبکه از فرستنده ({address}):\n{e}\nهدر دریافتی (بخش اول): {header_snippet}...")
          print(f"DEBUG: Connection/Header error during network test receive from {address}: {e}. Header snippet: {header_snippet}...")
          is_cancelled = True # Ensure is_cancelled is set on these errors
 
     except Exception as e:
         if not is_cancelled: # Avoid double reporting
-            gui_callbacks['update_status'](f"[!] خطایی در حین تست شبکه با {address} رخ داد: {e}")
-            gui_callbacks['show_error']("خطای تست شبکه", f"خطا در حین تست شبکه با {address}:\n{e}")
+            update_status_cb(f"[!] خطایی در حین تست شبکه با {address} رخ داد: {e}")
+            show_error_cb("خطای تست شبکه", f"خطا در حین تست شبکه با {address}:\n{e}")
             print(f"DEBUG: Uncaught Exception in handle_network_test_client with {address}: {e}", file=sys.stderr)
             is_cancelled = True
 
     finally:
         print(f"DEBUG: handle_network_test_client finally block entered for {address}")
-        if 'client_socket' in locals() and client_socket:
+        if recv_selector:
+            try: recv_selector.close()
+            except Exception: pass
+        if previous_cpu_affinity is not None:
+            # Pool threads are reused for later connections, give this one its full CPU set back
+            try: os.sched_setaffinity(0, previous_cpu_affinity)
+            except OSError: pass
+        if client_socket is not None:
             try: client_socket.close()
             except Exception: pass
             print(f"DEBUG: Client socket closed for {address}")
@@ -725,45 +1132,120 @@ def handle_network_test_client(client_socket, address, gui_callbacks, cancel_tes
         # This seems correct for the server side. The server waits for *new* connections.
         # Status updates within the handler are sufficient.
 
-        gui_callbacks['update_status'](f"[-] اتصال تست شبکه {address} بسته شد.")
+        update_status_cb(f"[-] اتصال تست شبکه {address} بسته شد.")
         # Speed/progress are managed by the main test client thread or main server accept loop
         # Don't call on_test_sequence_finished here.
         print(f"DEBUG: handle_network_test_client finished for {address}")
 
 
+# Wakeup sockets for threads that block in select() until their stop event is set (stop event -> sending end)
+_wakeup_sockets = {}
+_wakeup_sockets_lock = threading.Lock()
+
+
+# Linux: create the discovery UDP sockets non-blocking in the socket() call itself instead of a separate
+# setblocking(False) afterwards (Python already creates every socket with SOCK_CLOEXEC / accept4 where available)
+_SOCK_NONBLOCK = getattr(socket, 'SOCK_NONBLOCK', 0) if sys.platform.startswith('linux') else 0
+
+
+def _register_wakeup_socket(stop_event):
+    """ Creates a socketpair whose receiving end becomes readable when _set_and_wake(stop_event) is called """
+    wakeup_recv, wakeup_send = socket.socketpair()
+    wakeup_recv.setblocking(False)
+    with _wakeup_sockets_lock:
+        _wakeup_sockets[stop_event] = wakeup_send
+    return wakeup_recv, wakeup_send
+
+
+def _unregister_wakeup_socket(stop_event, wakeup_recv, wakeup_send):
+    """ Removes and closes a socketpair created by _register_wakeup_socket """
+    with _wakeup_sockets_lock:
+        if _wakeup_sockets.get(stop_event) is wakeup_send:
+            del _wakeup_sockets[stop_event]
+    for sock in (wakeup_recv, wakeup_send):
+        try: sock.close()
+        except Exception: pass
+
+
+def cancel_test(cancel_test_event):
+    """ Cancels the running test: sets the event and wakes a network test sender waiting for socket buffer space """
+    _set_and_wake(cancel_test_event)
+
+
+def _set_and_wake(stop_event):
+    """ Sets a stop event and wakes the thread (if any) waiting for it in select() """
+    stop_event.set()
+    with _wakeup_sockets_lock:
+        wakeup_send = _wakeup_sockets.get(stop_event)
+    if wakeup_send:
+        try: wakeup_send.send(b'\x00')
+        except OSError: pass
+
+
+def _enlarge_udp_receive_buffer(udp_socket):
+    """ Raises SO_RCVBUF of a discovery UDP socket so bursts of datagrams are not dropped; logs the value the kernel applied """
+    try:
+        udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, config.DISCOVERY_UDP_RECV_BUFFER_SIZE)
+        # The kernel may clamp (Linux: net.core.rmem_max) or double the requested value
+        print(f"DEBUG: Discovery UDP socket SO_RCVBUF requested {config.DISCOVERY_UDP_RECV_BUFFER_SIZE}, got {udp_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}")
+    except OSError as e:
+        print(f"DEBUG: Could not set SO_RCVBUF on discovery UDP socket: {e}", file=sys.stderr)
+
+
 def listen_for_network_test_discovery_task(stop_event, gui_callbacks, get_active_network_test_server_port_cb):
     """ Thread task to listen for UDP network test discovery messages and respond """
     print("DEBUG: listen_for_network_test_discovery_task started")
 
     udp_socket = None
+    discovery_selector = None
+    wakeup_recv, wakeup_send = None, None
     try:
-        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM | _SOCK_NONBLOCK, socket.IPPROTO_UDP)
         udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        _enlarge_udp_receive_buffer(udp_socket)
         udp_socket.bind(("", config.NETWORK_TEST_DISCOVERY_PORT))
         gui_callbacks['update_status'](f"[*] دریافت کننده تست شبکه در حال گوش دادن روی UDP پورت {config.NETWORK_TEST_DISCOVERY_PORT} (کشف سرور)")
         print(f"DEBUG: Network test discovery server listening on UDP port {config.NETWORK_TEST_DISCOVERY_PORT}")
 
+        # Block in select() until a datagram arrives or stop_network_test_discovery_listener() wakes us up,
+        # instead of waking up every 0.5s. The idle timeout only covers stop events set without a wakeup.
+        if not _SOCK_NONBLOCK: udp_socket.setblocking(False)
+        wakeup_recv, wakeup_send = _register_wakeup_socket(stop_event)
+        discovery_selector = selectors.DefaultSelector()
+        discovery_selector.register(udp_socket, selectors.EVENT_READ)
+        discovery_selector.register(wakeup_recv, selectors.EVENT_READ)
+
+        # Encoded response for the port it was built for; rebuilt only when the server binds a different port
+        response_port, response_bytes = None, None
+
         while not stop_event.is_set():
             try:
-                udp_socket.settimeout(0.5)
-                message, client_address = udp_socket.recvfrom(2048)
-                message = message.decode('utf-8', errors='ignore').strip()
-
-                if message == config.NETWORK_TEST_DISCOVERY_MESSAGE:
-                     active_network_test_server_port = get_active_network_test_server_port_cb()
-                     if active_network_test_server_port is not None:
-                         gui_callbacks['update_status'](f"[+] پیام کشف تست شبکه از {client_address[0]} دریافت شد. در حال ارسال پاسخ...")
-                         print(f"DEBUG: Network test discovery message from {client_address[0]}. Sending response.")
-                         current_response = f"{config.NETWORK_TEST_SERVER_RESPONSE_BASE} {active_network_test_server_port}"
-                         udp_socket.sendto(current_response.encode('utf-8'), client_address)
-                     else:
-                         # This case means the TCP server failed to bind, or stopped.
-                         print("DEBUG: Cannot respond to network test discovery, active_network_test_server_port is None or server not running.", file=sys.stderr)
+                if not discovery_selector.select(config.DISCOVERY_LISTENER_IDLE_TIMEOUT):
+                    continue
+                # Drain every datagram already queued before going back to select(), so a burst of
+                # broadcasts costs one wakeup instead of one per datagram
+                while True:
+                    try:
+                        message, client_address = udp_socket.recvfrom(2048)
+                    except BlockingIOError:
+                        break # Queue empty (or only the wakeup socket was readable)
+                    message = message.decode('utf-8', errors='ignore').strip()
+
+                    if message == config.NETWORK_TEST_DISCOVERY_MESSAGE:
+                         active_network_test_server_port = get_active_network_test_server_port_cb()
+                         if active_network_test_server_port is not None:
+                             gui_callbacks['update_status'](f"[+] پیام کشف تست شبکه از {client_address[0]} دریافت شد. در حال ارسال پاسخ...")
+                             print(f"DEBUG: Network test discovery message from {client_address[0]}. Sending response.")
+                             if active_network_test_server_port != response_port:
+                                 response_port = active_network_test_server_port
+                                 response_bytes = f"{config.NETWORK_TEST_SERVER_RESPONSE_BASE} {response_port}".encode('utf-8')
+                             udp_socket.sendto(response_bytes, client_address)
+                         else:
+                             # This case means the TCP server failed to bind, or stopped.
+                             print("DEBUG: Cannot respond to network test discovery, active_network_test_server_port is None or server not running.", file=sys.stderr)
 
 
-            except socket.timeout:
-                continue
             except Exception as e:
                  print(f"DEBUG: Minor error in Network Test UDP Discovery loop: {e}", file=sys.stderr)
                  time.sleep(0.1)
@@ -790,6 +1272,11 @@ def listen_for_network_test_discovery_task(stop_event, gui_callbacks, get_active
         stop_event.set()
     finally:
         print("DEBUG: listen_for_network_test_discovery_task finally block entered")
+        if discovery_selector:
+            try: discovery_selector.close()
+            except Exception: pass
+        if wakeup_recv:
+            _unregister_wakeup_socket(stop_event, wakeup_recv, wakeup_send)
         if udp_socket:
             try: udp_socket.close()
             except Exception: pass
@@ -798,6 +1285,11 @@ def listen_for_network_test_discovery_task(stop_event, gui_callbacks, get_active
         print("DEBUG: listen_for_network_test_discovery_task finished")
 
 
+# Worker threads for accepted network test connections, reused across connections instead of one new thread each.
+# Daemon threads: a handler still waiting on a slow or silent peer must not keep the process alive after the window closes.
+_network_test_client_executor = _DaemonThreadPool(max_workers=os.cpu_count() or 4, thread_name_prefix="net_test_client")
+
+
 def run_network_test_server_task(stop_event, gui_callbacks, set_active_network_test_server_port_cb):
     """ Thread task for the main TCP network test server (bind, listen, accept connections) """
     print("DEBUG: run_network_test_server_task started")
@@ -816,7 +1308,7 @@ def run_network_test_server_task(stop_event, gui_callbacks, set_active_network_t
                 tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 tcp_socket.bind(("0.0.0.0", port))
-                tcp_socket.listen(1) # Allow only one network test client connection at a time
+                tcp_socket.listen(config.NETWORK_TEST_LISTEN_BACKLOG) # Queue bursts of connecting test clients instead of refusing them
                 tcp_socket.settimeout(0.5)
                 active_network_test_server_port = port
                 port_bound = True
@@ -863,18 +1355,11 @@ def run_network_test_server_task(stop_event, gui_callbacks, set_active_network_t
 
         # Main server loop to accept connections
         while not stop_event.is_set():
-             # The network test server currently allows only one client connection at a time due to listen(1)
-             # If a handle_network_test_client thread is running, it will keep the accepted socket open.
-             # The accept loop will be blocked until the client disconnects or the handler thread finishes.
-             # The check for 'is_network_test_client_active_cb' seems misplaced here,
+             # Each accepted connection is handled on _network_test_client_executor; pending connections wait in the
+             # listen backlog, and once all workers are busy further handlers queue in the executor.
+             # The check for 'is_network_test_client_active_cb' does not belong here,
              # as that flag is set by the *client (sender)* side.
              # The network test server should just listen and accept the *next* connection.
-             # The listen(1) limits it to one pending connection.
-             # If you want to truly prevent accepting *while a handler is busy*,
-             # you would need a counter or a flag managed by the server thread,
-             # incremented before starting handler, decremented when handler finishes.
-             # For now, let's remove the 'is_network_test_client_active_cb' check from the server accept loop
-             # as it's incorrect logic for the server side. The listen(1) already limits concurrency.
 
             try:
                 client_socket, address = tcp_socket.accept()
@@ -897,19 +1382,16 @@ def run_network_test_server_task(stop_event, gui_callbacks, set_active_network_t
                 else:
                     print("DEBUG: get_test_buffer_size callback not found for net test handler, using default.", file=sys.stderr)
 
+                _tune_network_test_socket(client_socket, test_recv_buffer_size)
 
-                client_handler_thread = threading.Thread(
-                    target=handle_network_test_client,
-                    args=(
-                        client_socket,
-                        address,
-                        gui_callbacks,
-                        gui_callbacks['cancel_test_event'],
-                        test_recv_buffer_size # Pass the TEST buffer size for network test receive
-                    ),
-                    daemon=True
+                _network_test_client_executor.submit(
+                    handle_network_test_client,
+                    client_socket,
+                    address,
+                    gui_callbacks,
+                    gui_callbacks['cancel_test_event'],
+                    test_recv_buffer_size # Pass the TEST buffer size for network test receive
                 )
-                client_handler_thread.start()
             except socket.timeout:
                  # Expected timeout, check stop_event and loop again
                  continue
@@ -946,11 +1428,30 @@ def run_network_test_server_task(stop_event, gui_callbacks, set_active_network_t
         print("DEBUG: run_network_test_server_task finished")
 
 
+def _get_directed_broadcast_addresses():
+    """ Returns the IPv4 directed broadcast address of every interface that has one (Linux only, empty list elsewhere) """
+    addresses = []
+    if not sys.platform.startswith('linux'):
+        return addresses
+    probe_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, interface_name in socket.if_nameindex():
+            address = _get_interface_ipv4(probe_socket, interface_name, _SIOCGIFBRDADDR)
+            if address and address != "0.0.0.0" and address not in addresses:
+                addresses.append(address)
+    except OSError as e:
+        print(f"DEBUG: Could not enumerate network interfaces for discovery: {e}", file=sys.stderr)
+    finally:
+        probe_socket.close()
+    return addresses
+
+
 def discover_network_test_server_task(gui_callbacks):
     """ Thread task for the client to discover available network test servers using UDP broadcast """
     print("DEBUG: discover_network_test_server_task started")
 
     udp_socket = None
+    discover_selector = None
     found_server_info = None # (ip, port) tuple if found
 
     try:
@@ -958,8 +1459,9 @@ def discover_network_test_server_task(gui_callbacks):
         gui_callbacks['update_speed']("Speed: Discovering Test Receiver...")
         print(f"DEBUG: Broadcasting network test discovery message on UDP port {config.NETWORK_TEST_DISCOVERY_PORT}")
 
-        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM | _SOCK_NONBLOCK, socket.IPPROTO_UDP)
         udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        _enlarge_udp_receive_buffer(udp_socket)
         # No overall timeout on socket, use loop timeout
 
         message = config.NETWORK_TEST_DISCOVERY_MESSAGE.encode('utf-8')
@@ -968,14 +1470,25 @@ def discover_network_test_server_task(gui_callbacks):
             udp_socket.sendto(message, ('<broadcast>', config.NETWORK_TEST_DISCOVERY_PORT))
         except Exception as e:
             raise Exception(f"Error sending network test discovery broadcast: {e}")
+        # '<broadcast>' (255.255.255.255) only leaves through the default route's interface, so also send to the
+        # directed broadcast address of each interface to reach servers on the other NICs/VLANs
+        for broadcast_address in _get_directed_broadcast_addresses():
+            try:
+                udp_socket.sendto(message, (broadcast_address, config.NETWORK_TEST_DISCOVERY_PORT))
+                print(f"DEBUG: Sent network test discovery message to {broadcast_address}")
+            except OSError as e:
+                print(f"DEBUG: Could not send network test discovery message to {broadcast_address}: {e}", file=sys.stderr)
 
 
-        # Wait for a response
+        # Wait for a response: select() with the cancel check interval instead of a socket timeout per recv
+        if not _SOCK_NONBLOCK: udp_socket.setblocking(False)
+        discover_selector = selectors.DefaultSelector()
+        discover_selector.register(udp_socket, selectors.EVENT_READ)
         start_discover_time = time.time()
         while not gui_callbacks['cancel_test_event'].is_set() and (time.time() - start_discover_time) < config.DISCOVERY_TIMEOUT:
              try:
-                  # Set a short timeout within the loop to allow checking cancel event
-                  udp_socket.settimeout(config.CANCEL_CHECK_INTERVAL) # Use CANCEL_CHECK_INTERVAL
+                  if not discover_selector.select(config.CANCEL_CHECK_INTERVAL):
+                      continue # Nothing received yet, check cancel/timeout again
 
                   response, server_address = udp_socket.recvfrom(1024)
                   response = response.decode('utf-8', errors='ignore').strip()
@@ -1000,8 +1513,7 @@ def discover_network_test_server_task(gui_callbacks):
                             print(f"DEBUG: Malformed network test discovery response from {server_address[0]}: {response}", file=sys.stderr)
                             continue # Continue listening for other responses
 
-             except socket.timeout:
-                 # Expected timeout, just loop again
+             except BlockingIOError:
                  continue
              except Exception as e:
                  # Handle other errors during receive
@@ -1034,34 +1546,91 @@ def discover_network_test_server_task(gui_callbacks):
 
     finally:
         print("DEBUG: discover_network_test_server_task finally block entered")
+        if discover_selector:
+            try: discover_selector.close()
+            except Exception: pass
         if udp_socket:
             try: udp_socket.close()
             except Exception: pass
             print("DEBUG: Network test discovery socket closed")
 
-        # Return the found server info (or None)
-        return found_server_info
+    # Return the found server info (or None); outside finally so exceptions raised there are not swallowed
+    return found_server_info
+
+
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg') # Not available on Windows
+try: _IOV_MAX = os.sysconf('SC_IOV_MAX') # Max buffers per sendmsg() call
+except (AttributeError, ValueError, OSError): _IOV_MAX = 1024
+if _IOV_MAX <= 0: _IOV_MAX = 1024
+
+
+def _repeat_buffer_views(data_view, size):
+    """ Returns views that together cover 'size' bytes: data_view repeated, plus a slice of it for the remainder """
+    full_repeats, tail_size = divmod(size, len(data_view))
+    buffers = [data_view] * full_repeats
+    if tail_size: buffers.append(data_view[:tail_size])
+    return buffers
+
+
+def _send_buffers(sock, buffers, wait_writable):
+    """ Sends a list of buffers on a non-blocking socket, with scatter-gather sendmsg() calls where available instead of
+    joining them. Whenever the kernel send buffer is full wait_writable() is called; if it returns False the send is
+    abandoned and False is returned. Returns True once everything was sent.
+    The list is not modified, so a prebuilt list can be sent again and again """
+    remaining = buffers
+    index = 0
+    while index < len(remaining):
+        try:
+            if _HAS_SENDMSG:
+                # Common case: the whole list goes out in one call, without slicing (allocating) the list
+                sent = sock.sendmsg(remaining if index == 0 and len(remaining) <= _IOV_MAX else remaining[index:index + _IOV_MAX])
+            else:
+                sent = sock.send(remaining[index])
+        except BlockingIOError:
+            if not wait_writable():
+                return False
+            continue
+        # Skip the buffers that went out completely, keep the unsent part of a partially sent one
+        while sent:
+            if sent >= len(remaining[index]):
+                sent -= len(remaining[index])
+                index += 1
+            else:
+                if remaining is buffers: remaining = list(buffers) # Copy before trimming, the caller's list is reused
+                remaining[index] = remaining[index][sent:]
+                sent = 0
+    return True
 
 
 def run_network_test_client_task(chosen_buffer_size, gui_callbacks, cancel_test_event):
     """ Thread task for the network test client (discover server, connect, send test data, measure) """
     print(f"DEBUG: run_network_test_client_task started with buffer size {chosen_buffer_size}")
+    if chosen_buffer_size <= 0:
+        # Validated once here so the send loop needs no per-chunk guard against empty chunks
+        print(f"DEBUG: Invalid network test buffer size {chosen_buffer_size}, using 1 byte", file=sys.stderr)
+        chosen_buffer_size = 1
+    buffer_size_text = utils.format_bytes(chosen_buffer_size) # Formatted once, used in the status messages below
+    update_status_cb, update_progress_cb, update_speed_cb, show_info_cb, show_error_cb, on_test_sequence_finished_cb = utils.get_gui_callbacks(
+        gui_callbacks, 'update_status', 'update_progress', 'update_speed', 'show_info', 'show_error', 'on_test_sequence_finished')
 
     tcp_socket = None
+    sendfile_file = None
+    send_selector = None
+    wakeup_recv, wakeup_send = None, None
     is_cancelled = False
     server_info = None # Initialize server_info
 
     try: # Outer try block for the entire send process
-        gui_callbacks['update_status']("--- شروع حالت فرستنده تست شبکه ---")
-        gui_callbacks['update_speed']("Speed: Searching for Network Test Receiver...")
-        gui_callbacks['update_progress'](0)
+        update_status_cb("--- شروع حالت فرستنده تست شبکه ---")
+        update_speed_cb("Speed: Searching for Network Test Receiver...")
+        update_progress_cb(0)
 
         # Step 1: Discover the server
         # The discovery task runs and returns the result. It handles its own UI updates/errors.
         server_info = discover_network_test_server_task(gui_callbacks)
 
         if cancel_test_event.is_set():
-             gui_callbacks['update_status']("[*] تست شبکه توسط کاربر پس از کشف دریافت کننده لغو شد.")
+             update_status_cb("[*] تست شبکه توسط کاربر پس از کشف دریافت کننده لغو شد.")
              is_cancelled = True
              print("DEBUG: Network test client cancelled after discovery")
              return # Exit if cancelled
@@ -1079,52 +1648,60 @@ def run_network_test_client_task(chosen_buffer_size, gui_callbacks, cancel_test_
         server_ip, server_port = server_info
 
         # Step 2: Connect to the server
-        gui_callbacks['update_speed'](f"Speed: Connecting to {server_ip}:{server_port}...")
+        update_speed_cb(f"Speed: Connecting to {server_ip}:{server_port}...")
         print(f"DEBUG: Attempting to connect to network test TCP server at {server_ip}:{server_port}")
         tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Measure the link, not a small default send buffer (clamped to net.core.wmem_max where known)
+        send_buffer_size = config.NETWORK_TEST_SEND_SOCKET_BUFFER
+        system_wmem_max = _read_proc_int("/proc/sys/net/core/wmem_max")
+        if system_wmem_max: send_buffer_size = min(send_buffer_size, system_wmem_max)
+        try: tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer_size)
+        except OSError as e: print(f"DEBUG: Could not set SO_SNDBUF to {send_buffer_size} on network test socket: {e}", file=sys.stderr)
+        if config.NETWORK_TEST_SEND_NODELAY:
+            try: tcp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError as e: print(f"DEBUG: Could not set TCP_NODELAY on network test socket: {e}", file=sys.stderr)
         tcp_socket.settimeout(10) # Timeout for connection attempt
 
         print(f"DEBUG: Attempting socket.connect to {server_ip}:{server_port}")
         tcp_socket.connect((server_ip, server_port))
         print("DEBUG: Socket connection established")
         tcp_socket.settimeout(None) # Remove timeout after connection
-        gui_callbacks['update_status']("[+] اتصال تست شبکه برقرار شد.")
+        update_status_cb("[+] اتصال تست شبکه برقرار شد.")
 
         if cancel_test_event.is_set():
-             gui_callbacks['update_status']("[*] تست شبکه توسط کاربر پس از اتصال لغو شد.")
+             update_status_cb("[*] تست شبکه توسط کاربر پس از اتصال لغو شد.")
              is_cancelled = True
              print("DEBUG: Network test client cancelled after connection")
              return # Exit if cancelled
 
         # Step 3: Send test header (NET_TEST_START|testsize|buffersize)
         # Header format: NET_TEST_START|testsize|buffersize
-        header_str = f"{config.NETWORK_TEST_PROTOCOL_HEADER}{config.HEADER_SEPARATOR}{config.NETWORK_TEST_SIZE}{config.HEADER_SEPARATOR}{chosen_buffer_size}"
-        header_bytes = header_str.encode('utf-8')
+        header_bytes = _NET_TEST_CLIENT_HEADER_PREFIX + b"%d" % chosen_buffer_size
 
         if len(header_bytes) > config.BUFFER_SIZE_FOR_HEADER:
              # This should not happen with current config unless constants change
              error_msg = f"[!] خطای داخلی: هدر تست شبکه خیلی بزرگ است ({len(header_bytes)} بایت > {config.BUFFER_SIZE_FOR_HEADER} بایت)."
-             gui_callbacks['update_status'](error_msg)
-             gui_callbacks['show_error']("خطای هدر تست شبکه", "اطلاعات تست شبکه بیش از حد طولانی است.")
+             update_status_cb(error_msg)
+             show_error_cb("خطای هدر تست شبکه", "اطلاعات تست شبکه بیش از حد طولانی است.")
              is_cancelled = True
              print(f"DEBUG: Network test Header too large: {len(header_bytes)} > {config.BUFFER_SIZE_FOR_HEADER}")
              return
 
-        print(f"DEBUG: Sending network test header: {header_str}")
+        print(f"DEBUG: Sending network test header: {header_bytes!r}")
         tcp_socket.sendall(header_bytes)
-        gui_callbacks['update_status'](f"[*] هدر تست شبکه ارسال شد: {config.NETWORK_TEST_PROTOCOL_HEADER} | {utils.format_bytes(config.NETWORK_TEST_SIZE)} | {utils.format_bytes(chosen_buffer_size)}")
+        update_status_cb(f"[*] هدر تست شبکه ارسال شد: {config.NETWORK_TEST_PROTOCOL_HEADER} | {_NET_TEST_SIZE_TEXT} | {buffer_size_text}")
         print(f"DEBUG: Sent network test header ({len(header_bytes)} bytes)")
 
 
         # Step 4: Send the test data
-        gui_callbacks['update_status'](f"[*] در حال ارسال داده تست شبکه ({utils.format_bytes(config.NETWORK_TEST_SIZE)}) با بافر {utils.format_bytes(chosen_buffer_size)} به {server_ip}...")
-        gui_callbacks['update_progress'](0)
-        gui_callbacks['update_speed']("Speed: 0 B/s") # Reset speed for data transfer phase
+        update_status_cb(f"[*] در حال ارسال داده تست شبکه ({_NET_TEST_SIZE_TEXT}) با بافر {buffer_size_text} به {server_ip}...")
+        update_progress_cb(0)
+        update_speed_cb("Speed: 0 B/s") # Reset speed for data transfer phase
 
-        # Generate dummy data - cap allocation size to avoid memory issues with huge buffers
-        allocated_chunk_size = min(chosen_buffer_size, 4 * 1024 * 1024) # Cap allocation size to 4MB
-        try: data = os.urandom(allocated_chunk_size)
-        except NotImplementedError: data = b'\xAA' * allocated_chunk_size
+        # Dummy data: a slice of the shared random test data pool (generated once per process, not per test),
+        # capped at the pool size (4MB), larger buffers repeat it. Random so that compressing links can't inflate the result.
+        allocated_chunk_size = min(chosen_buffer_size, _DATA_POOL_SIZE)
+        data = memoryview(_get_test_data_pool())[:allocated_chunk_size]
 
         if not data:
              # Fallback if even small allocation failed
@@ -1132,66 +1709,109 @@ def run_network_test_client_task(chosen_buffer_size, gui_callbacks, cancel_test_
              data = b'\x00'
              allocated_chunk_size = 1
              if chosen_buffer_size > 1:
-                  gui_callbacks['update_status'](f"[!] هشدار: قادر به تولید داده تست بافر با اندازه {utils.format_bytes(chosen_buffer_size)} نبود. از بافر ۱ بایتی استفاده می‌شود.")
+                  update_status_cb(f"[!] هشدار: قادر به تولید داده تست بافر با اندازه {buffer_size_text} نبود. از بافر ۱ بایتی استفاده می‌شود.")
+        data_view = memoryview(data) # Sliced for each send, the data itself is never copied
 
 
         sent_bytes = 0
-        start_time = time.time()
+        start_time = time.monotonic() # Elapsed time only: immune to wall-clock (NTP) adjustments
         last_update_time = start_time
         last_update_bytes = 0
+        last_progress_pct = -1
+        last_speed_text = None
         print("DEBUG: Starting network test send loop")
 
         # Use the chosen buffer size for sending chunks
         send_buffer_size_for_loop = chosen_buffer_size # Use the size passed into this function
 
+        # If the buffer size is > allocated size, a chunk is the allocated data repeated plus a trailing slice.
+        # The views for a full chunk are built once here; only a shorter final chunk needs its own list.
+        full_chunk_buffers = _repeat_buffer_views(data_view, send_buffer_size_for_loop)
+
+        # Where os.sendfile exists, write one full chunk to a temporary file once and let the kernel send every chunk
+        # from it (page cache -> socket, no copy through Python); otherwise send the buffers from user space
+        if config.NETWORK_TEST_USE_SENDFILE and hasattr(os, 'sendfile'):
+            try:
+                sendfile_file = tempfile.TemporaryFile()
+                for chunk_buffer in full_chunk_buffers:
+                    sendfile_file.write(chunk_buffer)
+                sendfile_file.flush()
+                print(f"DEBUG: Network test data sent with sendfile() from a {send_buffer_size_for_loop} byte temporary file")
+            except OSError as e:
+                print(f"DEBUG: Could not prepare sendfile() test data file, sending from memory: {e}", file=sys.stderr)
+                if sendfile_file:
+                    sendfile_file.close()
+                    sendfile_file = None
+
+        if sendfile_file is not None:
+            # socket.sendfile() does not support non-blocking sockets: wait at most CANCEL_CHECK_INTERVAL per send instead
+            tcp_socket.settimeout(config.CANCEL_CHECK_INTERVAL)
+        else:
+            # Non-blocking socket: sends go straight to the kernel and only when its buffer is full do we wait in
+            # select() for buffer space or for cancel_test() (instant wakeup), instead of timing out every 0.5s
+            tcp_socket.setblocking(False)
+            send_selector = selectors.DefaultSelector()
+            send_selector.register(tcp_socket, selectors.EVENT_WRITE)
+            wakeup_recv, wakeup_send = _register_wakeup_socket(cancel_test_event)
+            send_selector.register(wakeup_recv, selectors.EVENT_READ)
+
+        def wait_until_writable():
+            """ Waits until the socket accepts more data; False if the test was cancelled meanwhile """
+            stall_deadline = time.monotonic() + config.DATA_TRANSFER_TIMEOUT
+            while not cancel_test_event.is_set():
+                for key, _ in send_selector.select(config.CANCEL_CHECK_INTERVAL):
+                    if key.fileobj is tcp_socket:
+                        return True
+                if time.monotonic() > stall_deadline:
+                    raise socket.timeout(f"No send progress for {config.DATA_TRANSFER_TIMEOUT} seconds")
+            return False
+
 
         while sent_bytes < config.NETWORK_TEST_SIZE:
             if cancel_test_event.is_set():
-                gui_callbacks['update_status']("[*] تست شبکه توسط کاربر لغو شد.")
+                update_status_cb("[*] تست شبکه توسط کاربر لغو شد.")
                 is_cancelled = True
                 print("DEBUG: Network test send cancelled by user")
                 break
 
+            # Always > 0: sent_bytes < NETWORK_TEST_SIZE (loop condition) and send_buffer_size_for_loop >= 1 (checked at entry)
             bytes_to_send_now = min(send_buffer_size_for_loop, config.NETWORK_TEST_SIZE - sent_bytes)
-            if bytes_to_send_now <= 0: break
-
-            # Prepare the chunk to send. If requested size is > allocated size, repeat allocated data.
-            chunk_to_send = b""
-            remaining_in_chunk = bytes_to_send_now
-            # This loop efficiently creates a chunk of size bytes_to_send_now by repeating 'data'
-            while remaining_in_chunk > 0:
-                bytes_from_data = min(remaining_in_chunk, allocated_chunk_size)
-                chunk_to_send += data[:bytes_from_data]
-                remaining_in_chunk -= bytes_from_data
 
             try:
-                tcp_socket.settimeout(config.CANCEL_CHECK_INTERVAL)
-                # Send the chunk over the socket
-                tcp_socket.sendall(chunk_to_send)
-                tcp_socket.settimeout(None)
+                if sendfile_file is not None:
+                    tcp_socket.sendfile(sendfile_file, 0, bytes_to_send_now) # Loops internally until the whole count is sent
+                else:
+                    # Send the chunk over the socket straight from the preallocated data, nothing is copied
+                    chunk_buffers = full_chunk_buffers if bytes_to_send_now == send_buffer_size_for_loop else _repeat_buffer_views(data_view, bytes_to_send_now)
+                    if not _send_buffers(tcp_socket, chunk_buffers, wait_until_writable):
+                        continue # Cancelled while waiting, reported at the top of the loop
             except socket.timeout:
-                 gui_callbacks['update_status']("[!] زمان انتظار برای ارسال داده تست شبکه تمام شد.")
+                 update_status_cb("[!] زمان انتظار برای ارسال داده تست شبکه تمام شد.")
                  print("DEBUG: Timeout during network test socket send")
                  is_cancelled = True
                  break
             except Exception as e:
-                 gui_callbacks['update_status'](f"[!] خطای ارسال داده تست شبکه به سوکت: {e}")
+                 update_status_cb(f"[!] خطای ارسال داده تست شبکه به سوکت: {e}")
                  print(f"DEBUG: Error sending network test data: {e}", file=sys.stderr)
                  is_cancelled = True
                  break
 
-            sent_bytes += len(chunk_to_send) # Add actual bytes sent
+            sent_bytes += bytes_to_send_now # The send returned, so the whole chunk was sent
 
-            current_time = time.time()
+            current_time = time.monotonic()
             progress = (sent_bytes / config.NETWORK_TEST_SIZE) * 100 if config.NETWORK_TEST_SIZE > 0 else 0
-            gui_callbacks['update_progress'](progress)
+            if int(progress) != last_progress_pct: # Only post to the GUI when the whole percentage changes
+                last_progress_pct = int(progress)
+                update_progress_cb(progress)
 
             if current_time - last_update_time >= config.SPEED_UPDATE_INTERVAL:
                 time_delta = current_time - last_update_time
                 bytes_since_last_update = sent_bytes - last_update_bytes
-                speed_bps = bytes_since_last_update / time_delta if time_delta > 0 else 0
-                speed_string = utils.format_bytes_per_second(speed_bps)
-                gui_callbacks['update_speed'](f"سرعت آپلود (فرستنده تست): {speed_string}")
+                speed_bps = bytes_since_last_update / time_delta # time_delta >= SPEED_UPDATE_INTERVAL > 0 here
+                speed_text = f"سرعت آپلود (فرستنده تست): {utils.format_bytes_per_second(speed_bps)}"
+                if speed_text != last_speed_text:
+                    last_speed_text = speed_text
+                    update_speed_cb(speed_text)
 
                 last_update_time = current_time
                 last_update_bytes = sent_bytes
@@ -1201,20 +1821,21 @@ def run_network_test_client_task(chosen_buffer_size, gui_callbacks, cancel_test_
         # Check if loop completed fully without cancellation
         if not is_cancelled and sent_bytes < config.NETWORK_TEST_SIZE:
              # Loop ended prematurely without cancellation and without sending full data
-             gui_callbacks['update_status'](f"[!] ارسال داده تست شبکه ناقص ماند ({utils.format_bytes(sent_bytes)}/{utils.format_bytes(config.NETWORK_TEST_SIZE)}) به {server_ip}.")
+             update_status_cb(f"[!] ارسال داده تست شبکه ناقص ماند ({utils.format_bytes(sent_bytes)}/{_NET_TEST_SIZE_TEXT}) به {server_ip}.")
              print(f"DEBUG: Network test send incomplete, sent {sent_bytes}/{config.NETWORK_TEST_SIZE} bytes")
              is_cancelled = True # Mark as cancelled due to incomplete send
 
 
         if not is_cancelled and sent_bytes >= config.NETWORK_TEST_SIZE:
-            end_time = time.time()
-            total_time = end_time - start_time
-            average_speed_bps = sent_bytes / total_time if total_time > 0 else 0
+            end_time = time.monotonic()
+            # The clock can tick coarsely (about 15ms on Windows): a very short test may measure 0 seconds
+            total_time = max(end_time - start_time, 1e-9)
+            average_speed_bps = sent_bytes / total_time
             average_speed_string = utils.format_bytes_per_second(average_speed_bps)
 
-            gui_callbacks['update_status'](f"[+] ارسال داده تست شبکه با موفقیت کامل شد.")
-            gui_callbacks['update_status'](f"    سرعت میانگین آپلود (فرستنده تست): {average_speed_string}")
-            gui_callbacks['show_info']("تست شبکه سمت فرستنده", f"ارسال داده تست شبکه کامل شد.\nسرعت میانگین آپلود: {average_speed_string}")
+            update_status_cb(f"[+] ارسال داده تست شبکه با موفقیت کامل شد.")
+            update_status_cb(f"    سرعت میانگین آپلود (فرستنده تست): {average_speed_string}")
+            show_info_cb("تست شبکه سمت فرستنده", f"ارسال داده تست شبکه کامل شد.\nسرعت میانگین آپلود: {average_speed_string}")
             print("DEBUG: Network test data sent successfully")
         # else: Status messages handled where break conditions were met
 
@@ -1223,74 +1844,72 @@ def run_network_test_client_task(chosen_buffer_size, gui_callbacks, cancel_test_
         # server_ip and server_port should be set if discovery was successful
         server_ip, server_port = server_info if server_info else ("N/A", "N/A")
         msg = f"[!] خطا: اتصال تست شبکه به {server_ip}:{server_port} رد شد. آیا دریافت کننده تست شبکه هنوز فعال است؟"
-        gui_callbacks['update_status'](msg)
-        gui_callbacks['show_error']("خطای اتصال تست شبکه", f"دریافت کننده تست شبکه در {server_ip}:{server_port} اتصال را رد کرد.\nممکن است متوقف شده باشد.")
+        update_status_cb(msg)
+        show_error_cb("خطای اتصال تست شبکه", f"دریافت کننده تست شبکه در {server_ip}:{server_port} اتصال را رد کرد.\nممکن است متوقف شده باشد.")
         print(f"DEBUG: Connection refused to {server_ip}:{server_port}")
         is_cancelled = True
     except socket.timeout:
         # This catches timeout during client_socket.connect()
         msg = "[!] خطا: زمان انتظار برای اتصال به دریافت کننده تست شبکه تمام شد."
-        gui_callbacks['update_status'](msg)
-        gui_callbacks['show_error']("خطای اتصال تست شبکه", "زمان انتظار برای اتصال به دریافت کننده تست شبکه تمام شد.")
+        update_status_cb(msg)
+        show_error_cb("خطای اتصال تست شبکه", "زمان انتظار برای اتصال به دریافت کننده تست شبکه تمام شد.")
         print("DEBUG: Socket timeout during connection attempt")
         is_cancelled = True
     except Exception as e:
         # Catch any other uncaught exceptions during the process
         if not is_cancelled:
             msg = f"[!] خطای تست شبکه (فرستنده): {e}"
-            gui_callbacks['update_status'](msg)
-            gui_callbacks['show_error']("خطای تست شبکه", f"خطایی در هنگام اجرای تست شبکه (فرستنده) رخ داد:\n{e}")
+            update_status_cb(msg)
+            show_error_cb("خطای تست شبکه", f"خطایی در هنگام اجرای تست شبکه (فرستنده) رخ داد:\n{e}")
             print(f"DEBUG: Uncaught Exception in run_network_test_client_task: {e}", file=sys.stderr)
             is_cancelled = True
 
     finally:
         print("DEBUG: run_network_test_client_task finally block entered")
-        if 'tcp_socket' in locals() and tcp_socket:
+        if tcp_socket is not None:
             try: tcp_socket.close()
             except Exception: pass
             print("DEBUG: Network test client socket closed")
+        if sendfile_file is not None:
+            try: sendfile_file.close()
+            except Exception: pass
+        if send_selector:
+            try: send_selector.close()
+            except Exception: pass
+        if wakeup_recv:
+            _unregister_wakeup_socket(cancel_test_event, wakeup_recv, wakeup_send)
 
         # Reset GUI elements related to test state
-        gui_callbacks['update_progress'](0)
-        gui_callbacks['update_speed']("Speed: N/A - Test Finished")
+        update_progress_cb(0)
+        update_speed_cb("Speed: N/A - Test Finished")
 
         # Signal GUI that the overall test sequence (a single client test counts as a sequence) is finished.
         # This callback resets the is_network_test_client_active flag and updates button states.
-        gui_callbacks['on_test_sequence_finished']()
+        on_test_sequence_finished_cb()
         print("DEBUG: run_network_test_client_task finished")
 
 
 # --- Public functions to be called by GUI ---
 
+# Shared (daemon) worker threads for the drive tests and the network test client, reused across clicks instead of one
+# new thread per start; each of these start_* returns the task's Future. The GUI runs one test at a time, the second
+# worker lets the next test start while the previous task is still finishing its cleanup. A task submitted while both
+# workers are busy waits in the queue until one is free.
+# The network test server and its discovery listener run for as long as the server is on, so they get their own
+# daemon threads instead of holding a pool worker.
+_test_task_executor = _DaemonThreadPool(max_workers=2, thread_name_prefix="tests")
+
 def start_write_test(buffer_size, gui_callbacks, cancel_test_event):
     print("DEBUG: tests.start_write_test called")
-    test_thread = threading.Thread(
-        target=run_write_speed_test_wrapper,
-        args=(buffer_size, gui_callbacks, cancel_test_event),
-        daemon=True
-    )
-    test_thread.start()
-    return test_thread
+    return _test_task_executor.submit(run_write_speed_test_wrapper, buffer_size, gui_callbacks, cancel_test_event)
 
 def start_read_test(buffer_size, gui_callbacks, cancel_test_event):
     print("DEBUG: tests.start_read_test called")
-    test_thread = threading.Thread(
-        target=run_read_speed_test_wrapper,
-        args=(buffer_size, gui_callbacks, cancel_test_event),
-        daemon=True
-    )
-    test_thread.start()
-    return test_thread
+    return _test_task_executor.submit(run_read_speed_test_wrapper, buffer_size, gui_callbacks, cancel_test_event)
 
 def start_all_tests(buffer_size, gui_callbacks, cancel_test_event):
     print("DEBUG: tests.start_all_tests called")
-    test_thread = threading.Thread(
-        target=run_all_tests_task,
-        args=(buffer_size, gui_callbacks, cancel_test_event),
-        daemon=True
-    )
-    test_thread.start()
-    return test_thread
+    return _test_task_executor.submit(run_all_tests_task, buffer_size, gui_callbacks, cancel_test_event)
 
 def start_network_test_server(gui_callbacks, stop_event, discovery_stop_event):
      print("DEBUG: tests.start_network_test_server called")
@@ -1304,11 +1923,15 @@ def start_network_test_server(gui_callbacks, stop_event, discovery_stop_event):
 
      return server_thread
 
+def stop_network_test_discovery_listener(discovery_stop_event):
+    """ Stops the network test discovery listener: sets its stop event and wakes it from select() """
+    _set_and_wake(discovery_stop_event)
+
 def stop_network_test_server(stop_event, discovery_stop_event, cancel_test_event, active_port):
      print("DEBUG: tests.stop_network_test_server called")
-     discovery_stop_event.set()
+     stop_network_test_discovery_listener(discovery_stop_event) # Also wakes the discovery listener blocked in select()
      stop_event.set()
-     cancel_test_event.set() # Cancel any active test *client handler* connections
+     cancel_test(cancel_test_event) # Cancel any active test *client handler* connections
 
      if active_port is not None:
         try:
@@ -1329,13 +1952,7 @@ def stop_network_test_server(stop_event, discovery_stop_event, cancel_test_event
 def start_network_test_client(buffer_size, gui_callbacks, cancel_test_event):
      print("DEBUG: tests.start_network_test_client called")
 
-     client_thread = threading.Thread(
-         target=run_network_test_client_task,
-         args=(buffer_size, gui_callbacks, cancel_test_event),
-         daemon=True
-     )
-     client_thread.start()
-     return client_thread
+     return _test_task_executor.submit(run_network_test_client_task, buffer_size, gui_callbacks, cancel_test_event)
 
 def start_network_test_discovery_listener(stop_event, gui_callbacks, get_active_network_test_server_port_cb):
     """ Thread task to listen for UDP network test discovery messages and respond """
@@ -35,6 +35,7 @@ def handle_client_folder_transfer(client_socket, address, gui_callbacks, cancel_
 
     save_dir_base = "received_folders" # Base directory for received folders
     current_save_dir = None # This will be set to the actual base directory *inside* save_dir_base based on client's root folder name
+    current_save_ctx = None # utils.SanitizeContext for current_save_dir, built once and reused for every item path
     session_root_name = None # Store the determined root folder name for the session
     received_files_base_abs = None # Absolute path to the base received_folders directory
 
@@ -221,6 +222,9 @@ def handle_client_folder_transfer(client_socket, address, gui_callbacks, cancel_
                            else:
                                 print(f"DEBUG: Session base directory already exists: {current_save_dir}. Content will be added/overwritten.")
 
+                           # Resolve the session base directory once; every FOLDER/FILE item is sanitized against it
+                           current_save_ctx = utils.SanitizeContext(current_save_dir)
+
 
                            session_root_name = sanitized_root_name # Store the final sanitized root name for later use
                            print(f"DEBUG: Session root name determined and sanitized: {session_root_name}")
@@ -471,7 +475,7 @@ def handle_client_folder_transfer(client_socket, address, gui_callbacks, cancel_
                               try:
                                   # Pass the current_save_dir (e.g., received_folders/rego) as base,
                                   # and the path_for_sanitization (e.g., fdfg/ewss/ or "") as the relative path.
-                                  sanitized_full_path = utils.sanitize_path(current_save_dir, path_for_sanitization)
+                                  sanitized_full_path = utils.sanitize_path(current_save_ctx, path_for_sanitization)
                                   print(f"DEBUG: Sanitizing FOLDER path relative part '{path_for_sanitization}' against base '{current_save_dir}' -> Result: '{sanitized_full_path}'")
 
                                   # Check if the resulting path is the session root directory itself (current_save_dir).
@@ -538,7 +542,7 @@ def handle_client_folder_transfer(client_socket, address, gui_callbacks, cancel_
                               try:
                                   # Pass the current_save_dir (e.g., received_folders/rego) as base,
                                   # and the path_for_sanitization (e.g., subdir/file.txt) as the relative path.
-                                  sanitized_full_path = utils.sanitize_path(current_save_dir, path_for_sanitization)
+                                  sanitized_full_path = utils.sanitize_path(current_save_ctx, path_for_sanitization)
                                   print(f"DEBUG: Sanitizing FILE path relative part '{path_for_sanitization}' against base '{current_save_dir}' -> Result: '{sanitized_full_path}'")
 
                                   # Check if the resulting path is the session root directory itself (current_save_dir).
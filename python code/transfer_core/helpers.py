@@ -1,6 +1,7 @@
 # transfer_core/helpers.py - Common helper functions and exceptions for transfer operations
 
 import socket
+import os
 import time
 import sys # Import sys for stderr in error prints if needed (though avoided in helper itself)
 
@@ -132,4 +133,31 @@ def read_header_from_socket(sock, gui_callbacks, cancel_event, initial_buffer=b"
             raise ValueError("Header buffer size exceeded limit without finding separator.")
 
     # If loop finishes without finding separator after overall timeout
-    raise socket.timeout("Overall timeout waiting for complete header.")
\ No newline at end of file
+    raise socket.timeout("Overall timeout waiting for complete header.")
+
+# --- Helper for Vectored File Writes ---
+def write_all_vectored(fd, views):
+    """
+    Writes all given buffers to a file descriptor using os.writev (scatter-gather).
+    os.writev may write fewer bytes than requested, so the call is repeated until every buffer is drained.
+    Only call this where hasattr(os, 'writev') is True (not available on Windows).
+
+    Args:
+        fd (int): The file descriptor to write to.
+        views (list): List of bytes-like objects (usually memoryview slices) to write in order.
+
+    Returns:
+        int: Total number of bytes written.
+    """
+    total_written = 0
+    views = list(views) # Don't modify the caller's list
+    while views:
+        written = os.writev(fd, views)
+        total_written += written
+        # Drop buffers that were fully written and trim the first partially written one
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = memoryview(views[0])[written:]
+    return total_written
@@ -10,7 +10,7 @@ import sys # Import sys for stderr
 # Import config and utils and helpers using relative imports within the package structure
 import config # Assuming config is in the package root
 import utils # Assuming utils is in the package root
-from .helpers import CancelledError, read_header_from_socket # Import custom exception and helper
+from .helpers import CancelledError, read_header_from_socket, write_all_vectored # Import custom exception and helpers
 
 
 # --- File Transfer Server Handler (for single files) ---
@@ -29,8 +29,12 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
         initial_buffer (bytes): Any initial data already read from the socket before starting this handler.
     """
     print(f"DEBUG: handle_client_connection started for {address} (Single File) with initial buffer size {len(initial_buffer)}")
-    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[+] اتصال جدید از {address} برای دریافت فایل تکی")
-    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_speed'], "Speed: Connecting...") # Initial speed status
+    gui_root, update_status_cb, update_progress_cb, update_speed_cb, show_error_cb, on_transfer_finished_cb = utils.get_gui_callbacks(
+        gui_callbacks, 'root', 'update_status', 'update_progress', 'update_speed', 'show_error', 'on_transfer_finished')
+    safe_gui_update = utils.safe_gui_update
+
+    safe_gui_update(gui_root, update_status_cb, f"[+] اتصال جدید از {address} برای دریافت فایل تکی")
+    safe_gui_update(gui_root, update_speed_cb, "Speed: Connecting...") # Initial speed status
 
     filesize = 0
     filename_from_header = "N/A" # Store the potentially non-sanitized filename from header
@@ -76,7 +80,7 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
                 raise ValueError(f"Negative filesize received: {filesize}")
             # Add a sanity check for file size (e.g., against a very large number)
             if filesize > config.TEST_FILE_SIZE * 10000: # Example: 10000 times the test file size
-                 utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] هشدار: اندازه فایل اعلام شده ({utils.format_bytes(filesize)}) برای '{filename_from_header}' بسیار بزرگ است. ممکن است خطا باشد.")
+                 safe_gui_update(gui_root, update_status_cb, f"[!] هشدار: اندازه فایل اعلام شده ({utils.format_bytes(filesize)}) برای '{filename_from_header}' بسیار بزرگ است. ممکن است خطا باشد.")
                  print(f"WARNING: Declared file size {filesize} seems excessively large for '{filename_from_header}'. Aborting receive.", file=sys.stderr)
                  raise ValueError(f"Declared file size ({filesize}) is excessively large for '{filename_from_header}'. Aborting transfer.")
 
@@ -107,7 +111,7 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
 
         # Check if cancelled after header receive
         if cancel_transfer_event.is_set():
-             utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], "[*] دریافت فایل توسط کاربر لغو شد.")
+             safe_gui_update(gui_root, update_status_cb, "[*] دریافت فایل توسط کاربر لغو شد.")
              is_cancelled = True
              print("DEBUG: File receive cancelled after header receive")
              # Exit the try block, which will lead to the outer finally block
@@ -119,14 +123,14 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
         # It's crucial to sanitize the filename to prevent path traversal attacks.
         save_filename_raw = os.path.basename(filename_from_header)
 
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[*] شروع دریافت: {save_filename_raw} ({utils.format_bytes(filesize)}) از {address}")
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"    بافر دریافت سمت گیرنده: {utils.format_bytes(receive_buffer_size)}")
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"    بافر اعلام شده فرستنده: {utils.format_bytes(current_buffer_size_from_header)}")
+        safe_gui_update(gui_root, update_status_cb, f"[*] شروع دریافت: {save_filename_raw} ({utils.format_bytes(filesize)}) از {address}")
+        safe_gui_update(gui_root, update_status_cb, f"    بافر دریافت سمت گیرنده: {utils.format_bytes(receive_buffer_size)}")
+        safe_gui_update(gui_root, update_status_cb, f"    بافر اعلام شده فرستنده: {utils.format_bytes(current_buffer_size_from_header)}")
 
 
         # Ensure progress is reset and speed display is ready
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_progress'], 0)
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_speed'], "Speed: 0 B/s")
+        safe_gui_update(gui_root, update_progress_cb, 0)
+        safe_gui_update(gui_root, update_speed_cb, "Speed: 0 B/s")
 
 
         save_dir = "received_files" # Base directory for received files
@@ -175,8 +179,8 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
              print(f"DEBUG: Final save path determined: {file_path}")
 
         except (ValueError, OSError, RuntimeError) as e:
-             utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطای نام فایل یا مسیر: {e}")
-             utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['show_error'], "خطای امنیتی/نام فایل", f"خطا در تمیزکاری یا اعتبارسنجی نام فایل دریافتی:\n{e}\nدریافت لغو شد.")
+             safe_gui_update(gui_root, update_status_cb, f"[!] خطای نام فایل یا مسیر: {e}")
+             safe_gui_update(gui_root, show_error_cb, "خطای امنیتی/نام فایل", f"خطا در تمیزکاری یا اعتبارسنجی نام فایل دریافتی:\n{e}\nدریافت لغو شد.")
              print(f"DEBUG: Error sanitizing filename '{save_filename_raw}' or preparing path: {e}", file=sys.stderr)
              is_cancelled = True
              # Exit the try block
@@ -186,7 +190,7 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
         start_time = time.time()
         last_update_time = start_time
         last_update_bytes = 0
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_speed'], "Speed: 0 B/s") # Start speed display here
+        safe_gui_update(gui_root, update_speed_cb, "Speed: 0 B/s") # Start speed display here
         print(f"DEBUG: Starting file receive loop into {file_path}")
 
         # Open file here, outside the loop, and use try/finally for closing
@@ -199,7 +203,7 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
                            pass # Just create an empty file
                       print(f"DEBUG: Empty file '{file_path}' created.")
                       transfer_success = True # 0-byte file creation is successful transfer
-                      utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[+] دریافت فایل خالی کامل شد: '{save_filename_raw}'")
+                      safe_gui_update(gui_root, update_status_cb, f"[+] دریافت فایل خالی کامل شد: '{save_filename_raw}'")
                       # Skip the receive loop and proceed to inner finally and then outer finally
                       return # Exit the function early for 0-byte files
 
@@ -233,10 +237,20 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
             # Use the *receiver's configured buffer size* for recv() calls (passed to handle_client_connection)
             recv_buffer_size_for_loop = receive_buffer_size # Use the size passed into this function
 
+            # Where available, receive into a ring of preallocated buffers with recv_into() and drain several
+            # chunks to disk per os.writev() call. Falls back to recv() + write() otherwise (e.g. Windows).
+            use_writev = hasattr(os, 'writev')
+            if use_writev:
+                writev_slots = max(1, min(config.WRITEV_BATCH_SLOTS, config.WRITEV_BATCH_MAX_BYTES // recv_buffer_size_for_loop))
+                recv_slot_views = [memoryview(bytearray(recv_buffer_size_for_loop)) for _ in range(writev_slots)]
+                pending_views = [] # Received chunks not yet written to disk
+                file_handle.flush() # The initial buffer went through the buffered file object; flush it before writing to the fd directly
+                file_fd = file_handle.fileno()
+
 
             while received_bytes < filesize:
                 if cancel_transfer_event.is_set():
-                    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], "[*] دریافت فایل توسط کاربر لغو شد.")
+                    safe_gui_update(gui_root, update_status_cb, "[*] دریافت فایل توسط کاربر لغو شد.")
                     is_cancelled = True
                     print("DEBUG: File receive cancelled by user")
                     break # Exit loop on cancel
@@ -251,46 +265,58 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
                          # Should only happen if remaining_buffer fulfilled the file, or filesize was 0 (handled above)
                          break # Exit loop if nothing more to read (file fully received)
 
-                    bytes_read_chunk = client_socket.recv(bytes_to_read_now) # Use receive_buffer_size here
+                    if use_writev:
+                        # Receive straight into the next free slot of the buffer ring
+                        bytes_read_count = client_socket.recv_into(recv_slot_views[len(pending_views)], bytes_to_read_now)
+                    else:
+                        bytes_read_chunk = client_socket.recv(bytes_to_read_now) # Use receive_buffer_size here
+                        bytes_read_count = len(bytes_read_chunk)
                     client_socket.settimeout(None) # Remove timeout after successful read
 
                 except socket.timeout:
                     # This allows cancel event check. Continue receiving.
                     continue # Go back to the start of the while loop
                 except Exception as e: # Catch errors during socket read within the loop
-                    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطای خواندن داده از سوکت: {e}")
+                    safe_gui_update(gui_root, update_status_cb, f"[!] خطای خواندن داده از سوکت: {e}")
                     print(f"DEBUG: Error reading from socket during receive: {e}")
                     is_cancelled = True
                     break # Exit loop on socket error
 
-                if not bytes_read_chunk:
+                if not bytes_read_count:
                     # This means the sender closed the connection prematurely
-                    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] اتصال با {address} قبل از اتمام دریافت قطع شد.")
+                    safe_gui_update(gui_root, update_status_cb, f"[!] اتصال با {address} قبل از اتمام دریافت قطع شد.")
                     print(f"DEBUG: Connection lost during receive from {address}")
                     is_cancelled = True
                     break # Exit loop on connection loss
 
                 try:
-                    file_handle.write(bytes_read_chunk)
+                    if use_writev:
+                        pending_views.append(recv_slot_views[len(pending_views)][:bytes_read_count])
+                        # Drain when the ring is full or this chunk completes the file
+                        if len(pending_views) == writev_slots or received_bytes + bytes_read_count >= filesize:
+                            write_all_vectored(file_fd, pending_views)
+                            pending_views.clear()
+                    else:
+                        file_handle.write(bytes_read_chunk)
                 except Exception as e: # Catch errors during file write within the loop
-                    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطای نوشتن داده در فایل: {e}")
+                    safe_gui_update(gui_root, update_status_cb, f"[!] خطای نوشتن داده در فایل: {e}")
                     print(f"DEBUG: Error writing data to file: {e}")
                     is_cancelled = True
                     break # Exit loop on file write error
 
-                received_bytes += len(bytes_read_chunk)
+                received_bytes += bytes_read_count
 
                 # Update progress and speed display
                 current_time = time.time()
                 progress = (received_bytes / filesize) * 100 if filesize > 0 else 0
-                utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_progress'], progress)
+                safe_gui_update(gui_root, update_progress_cb, progress)
 
                 if current_time - last_update_time >= config.SPEED_UPDATE_INTERVAL:
                     time_delta = current_time - last_update_time
                     bytes_since_last_update = received_bytes - last_update_bytes
                     speed_bps = bytes_since_last_update / time_delta if time_delta > 0 else 0
                     speed_string = utils.format_bytes_per_second(speed_bps)
-                    utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_speed'], f"سرعت دانلود: {speed_string}")
+                    safe_gui_update(gui_root, update_speed_cb, f"سرعت دانلود: {speed_string}")
 
                     last_update_time = current_time
                     last_update_bytes = received_bytes
@@ -308,8 +334,8 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
              # This catches errors like issues with file handle operations outside the main loop,
              # or exceptions raised by `read_header_from_socket` within the outer try.
              if not is_cancelled: # Only report error if not already marked cancelled by user or socket error
-                 utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطایی در حین دریافت فایل از {address} رخ داد: {e}")
-                 utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['show_error'], "خطای دریافت", f"خطا در دریافت فایل از {address}:\n{e}")
+                 safe_gui_update(gui_root, update_status_cb, f"[!] خطایی در حین دریافت فایل از {address} رخ داد: {e}")
+                 safe_gui_update(gui_root, show_error_cb, "خطای دریافت", f"خطا در دریافت فایل از {address}:\n{e}")
                  print(f"DEBUG: Exception during file receive loop with {address}: {e}")
                  is_cancelled = True # Mark as cancelled due to error
                  transfer_success = False # Not successful
@@ -335,11 +361,11 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
                       time.sleep(0.01) # Give OS a moment
                       os.remove(file_path)
                       # Use original filename in status message as sanitized one might be less readable
-                      utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] فایل ناقص '{save_filename_raw}' حذف شد.")
+                      safe_gui_update(gui_root, update_status_cb, f"[!] فایل ناقص '{save_filename_raw}' حذف شد.")
                       print(f"DEBUG: Incomplete file '{file_path}' removed.")
                  except Exception as e:
                       # Use original filename in status message
-                      utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطا در حذف فایل ناقص '{save_filename_raw}': {e}")
+                      safe_gui_update(gui_root, update_status_cb, f"[!] خطا در حذف فایل ناقص '{save_filename_raw}': {e}")
                       print(f"DEBUG: Error removing incomplete file '{file_path}': {e}", file=sys.stderr)
 
 
@@ -348,16 +374,16 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
         # This catches errors from the header reading phase or initial setup before file is opened.
         # Use header_str_for_debug in error message if available
         msg = f"[!] خطا در ارتباط یا هدر با {address}: {e}"
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], msg)
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['show_error'], "خطای دریافت فایل", f"خطا در ارتباط یا هدر فایل از فرستنده ({address}):\n{e}\nهدر دریافتی (حدود): {header_str_for_debug}")
+        safe_gui_update(gui_root, update_status_cb, msg)
+        safe_gui_update(gui_root, show_error_cb, "خطای دریافت فایل", f"خطا در ارتباط یا هدر فایل از فرستنده ({address}):\n{e}\nهدر دریافتی (حدود): {header_str_for_debug}")
         print(f"DEBUG: Connection/Header error during single file receive from {address}: {e}. Header snippet: {header_str_for_debug}...")
         is_cancelled = True # Ensure is_cancelled is set on these errors
         transfer_success = False # Not successful
 
     except Exception as e: # Catch any other uncaught exceptions from the outer try block
         if not is_cancelled: # Avoid double reporting if already marked cancelled by specific error
-            utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] خطایی در حین پردازش اتصال از {address} رخ داد: {e}")
-            utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['show_error'], "خطای پردازش اتصال", f"خطا در پردازش اتصال از {address}:\n{e}")
+            safe_gui_update(gui_root, update_status_cb, f"[!] خطایی در حین پردازش اتصال از {address} رخ داد: {e}")
+            safe_gui_update(gui_root, show_error_cb, "خطای پردازش اتصال", f"خطا در پردازش اتصال از {address}:\n{e}")
             print(f"DEBUG: Uncaught Exception in handle_client_connection with {address}: {e}", file=sys.stderr)
             is_cancelled = True # Mark as cancelled due to error
             transfer_success = False # Not successful
@@ -395,21 +421,21 @@ def handle_client_connection(client_socket, address, gui_callbacks, cancel_trans
              pass
         elif is_cancelled:
              # Cancellation message was already shown
-             utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[*] انتقال فایل با {address} لغو شد.")
+             safe_gui_update(gui_root, update_status_cb, f"[*] انتقال فایل با {address} لغو شد.")
              # No need for show_warning/error if it was a user-initiated cancel
         else:
              # It failed due to an error that wasn't explicitly handled by a more specific status message
              # The error message should have been shown by the except blocks
-             utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[!] انتقال فایل با {address} با خطا پایان یافت.")
+             safe_gui_update(gui_root, update_status_cb, f"[!] انتقال فایل با {address} با خطا پایان یافت.")
 
 
         # Reset GUI elements related to transfer state (Progress bar, Speed display)
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_progress'], 0) # Reset progress bar
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_speed'], "Speed: N/A - Transfer Finished") # Reset speed display
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['update_status'], f"[-] هندلر اتصال با {address} پایان یافت.")
+        safe_gui_update(gui_root, update_progress_cb, 0) # Reset progress bar
+        safe_gui_update(gui_root, update_speed_cb, "Speed: N/A - Transfer Finished") # Reset speed display
+        safe_gui_update(gui_root, update_status_cb, f"[-] هندلر اتصال با {address} پایان یافت.")
 
 
         # Signal GUI that the transfer is finished (resets is_transfer_active flag in GUI)
         # This is crucial for allowing the server to accept new connections or enabling other GUI actions.
-        utils.safe_gui_update(gui_callbacks['root'], gui_callbacks['on_transfer_finished'])
+        safe_gui_update(gui_root, on_transfer_finished_cb)
         print(f"DEBUG: handle_client_connection finished for {address}")
\ No newline at end of file
@@ -2,48 +2,48 @@
 
 import tkinter as tk
 from tkinter import messagebox
-import math
 import sys
 import os
 import re # Added for basic filename sanitization
+import threading # Lock for the coalesced status message queue
+import collections
 
 # Import configuration (using absolute import relative to the package root)
 import config # Assuming config.py is in the package root
 
 # --- Helper Functions (General purpose) ---
+_UNIT_NAMES = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+_UNIT_DIVISORS = tuple(1024 ** i for i in range(len(_UNIT_NAMES)))
+
+def _unit_index(value):
+     """ Index of the largest 1024-based unit not above value (value > 0), from the bit length instead of log() """
+     # bit_length() - 1 is floor(log2(value)), every unit is 10 bits; values below 1 (floats) stay in bytes
+     return min(max(int(value).bit_length() - 1, 0) // 10, len(_UNIT_NAMES) - 1)
+
 def format_bytes(byte_count):
      """ فرمت کردن تعداد بایت ها به KB, MB, GB """
      if byte_count is None or byte_count < 0: return "N/A"
      if byte_count == 0: return "0 B"
-     size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-     if byte_count > 0:
-        try: i = int(math.floor(math.log(byte_count, 1024)))
-        except ValueError: i = 0 # Handles log(0) and potentially negative
-        p = math.pow(1024, i)
-        s = round(byte_count / p, 2)
-        return f"{s} {size_name[i]}"
-     else: return "0 B"
+     i = _unit_index(byte_count)
+     s = round(byte_count / _UNIT_DIVISORS[i], 2)
+     return f"{s} {_UNIT_NAMES[i]}"
 
 def format_bytes_per_second(speed_bps):
     """ فرمت کردن سرعت (بایت بر ثانیه) به KB/s, MB/s, GB/s """
     if speed_bps is None or speed_bps < 0: return "N/A/s" # Consistent with bytes
     if speed_bps == 0: return "0 B/s"
-    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    if speed_bps > 0:
-       try: i = int(math.floor(math.log(speed_bps, 1024)))
-       except ValueError: i = 0 # Handles log(0) and potentially negative
-       p = math.pow(1024, i)
-       s = round(speed_bps / p, 2)
-       return f"{s} {size_name[i]}/s"
-    else: return "0 B/s"
+    i = _unit_index(speed_bps)
+    s = round(speed_bps / _UNIT_DIVISORS[i], 2)
+    return f"{s} {_UNIT_NAMES[i]}/s"
 
 # Modified: Removed Auto logic as per v1.2 config
 def get_buffer_size(selected_option):
     """ برگرداندن اندازه بافر بر اساس انتخاب کاربر """
     # Use config directly as it's imported
     # Now expects selected_option to be a key from BUFFER_OPTIONS
-    if selected_option in config.BUFFER_OPTIONS:
-        return config.BUFFER_OPTIONS[selected_option]
+    buffer_size = config.BUFFER_OPTIONS.get(selected_option) # One dict lookup for the common (valid) case
+    if buffer_size is not None:
+        return buffer_size
     # Fallback to a default size if the option is not found or BUFFER_OPTIONS is empty
     # A safer fallback is to use a small, known good size like 4096.
     fallback_size = 4096
@@ -89,6 +89,45 @@ def sanitize_filename_part(part):
     return sanitized_part
 
 
+class SanitizeContext:
+    """
+    Base directory for sanitize_path, resolved once (abspath, normpath, normcase) and reused for many items.
+    Build it once at the start of a transfer and pass it to sanitize_path instead of the base_dir string,
+    so per-item calls skip the abspath (getcwd) / exists / normalization work on the base directory.
+
+    Raises the same errors as sanitize_path does for an invalid base directory.
+    """
+    __slots__ = ('base_dir', 'abs', 'abs_norm', 'norm_case', 'norm_case_prefix')
+
+    def __init__(self, base_dir):
+        if not base_dir:
+            raise ValueError("Base directory for sanitization cannot be empty.")
+
+        # اطمینان از وجود base_dir و تبدیل آن به مسیر مطلق و نرمالیزه
+        try:
+            base_dir_abs = os.path.abspath(base_dir)
+            # اطمینان از وجود base_dir قبل از استفاده
+            if not os.path.exists(base_dir_abs):
+                 print(f"DEBUG: Base directory '{base_dir_abs}' does not exist, attempting to create.")
+                 try: os.makedirs(base_dir_abs, exist_ok=True)
+                 except OSError as e:
+                      raise OSError(f"Failed to create base directory '{base_dir_abs}': {e}") from e # Re-raise OS error with context
+                 except Exception as e:
+                      raise RuntimeError(f"Unexpected error creating base directory '{base_dir_abs}': {e}") from e
+
+        except Exception as e:
+             # Catch errors related to abspath or exists on base_dir itself
+             raise ValueError(f"Invalid base directory path '{base_dir}': {e}") from e
+
+        self.base_dir = base_dir
+        self.abs = base_dir_abs
+        self.abs_norm = os.path.normpath(base_dir_abs)
+        # Compare using normcase for case-insensitive file systems (Windows).
+        self.norm_case = os.path.normcase(self.abs_norm)
+        # A root base dir (e.g. '/' or 'C:\\') already ends with a separator
+        self.norm_case_prefix = self.norm_case if self.norm_case.endswith(os.sep) else self.norm_case + os.sep
+
+
 def sanitize_path(base_dir, relative_path):
     """
     مسیر نسبی دریافتی را تمیزکاری و اعتبارسنجی می‌کند تا از Path Traversal جلوگیری شود.
@@ -96,7 +135,7 @@ def sanitize_path(base_dir, relative_path):
     مسیر نسبی (relative_path) باید با استفاده از جداکننده '/' پروتکل باشد.
 
     Args:
-        base_dir (str): دایرکتوری پایه‌ای که فایل‌ها/پوشه‌ها باید در آن ذخیره شوند.
+        base_dir (str or SanitizeContext): دایرکتوری پایه‌ای که فایل‌ها/پوشه‌ها باید در آن ذخیره شوند.
         relative_path (str): مسیر آیتم (فایل یا پوشه) نسبت به پوشه اصلی ارسالی توسط فرستنده، با جداکننده '/'.
 
     Returns:
@@ -107,24 +146,11 @@ def sanitize_path(base_dir, relative_path):
         OSError: اگر ایجاد base_dir با مشکل مواجه شود.
         RuntimeError: برای خطاهای غیرمنتظره در ایجاد base_dir.
     """
-    if not base_dir:
-        raise ValueError("Base directory for sanitization cannot be empty.")
-
     # مرحله 1: اطمینان از وجود base_dir و تبدیل آن به مسیر مطلق و نرمالیزه
-    try:
-        base_dir_abs = os.path.abspath(base_dir)
-        # اطمینان از وجود base_dir قبل از استفاده
-        if not os.path.exists(base_dir_abs):
-             print(f"DEBUG: Base directory '{base_dir_abs}' does not exist, attempting to create.")
-             try: os.makedirs(base_dir_abs, exist_ok=True)
-             except OSError as e:
-                  raise OSError(f"Failed to create base directory '{base_dir_abs}': {e}") from e # Re-raise OS error with context
-             except Exception as e:
-                  raise RuntimeError(f"Unexpected error creating base directory '{base_dir_abs}': {e}") from e
-
-    except Exception as e:
-         # Catch errors related to abspath or exists on base_dir itself
-         raise ValueError(f"Invalid base directory path '{base_dir}': {e}") from e
+    # (callers sanitizing many items pass a prebuilt SanitizeContext so this is done only once)
+    base_ctx = base_dir if isinstance(base_dir, SanitizeContext) else SanitizeContext(base_dir)
+    base_dir = base_ctx.base_dir # Original base dir, for error messages
+    base_dir_abs = base_ctx.abs
 
 
     # مرحله 2: تمیزکاری تکه‌های مسیر نسبی
@@ -181,14 +207,17 @@ def sanitize_path(base_dir, relative_path):
 
     # Step 4: اعتبارسنجی نهایی - مطمئن شوید مسیر نرمالیزه شده همچنان در base_dir_abs قرار دارد
     # نیاز است که base_dir_abs هم نرمالایز شود تا چک مقایسه درست انجام شود.
-    base_dir_abs_norm = os.path.normpath(base_dir_abs)
+    base_dir_abs_norm = base_ctx.abs_norm
 
-    # Use os.path.commonpath to check if normalized_full_path is within base_dir_abs_norm
+    # Both paths are already normalized, so a plain prefix check on the normcased strings is enough
+    # to tell whether normalized_full_path is within base_dir_abs_norm (no need for os.path.commonpath).
     # Compare using normcase for case-insensitive file systems (Windows).
-    common_path = os.path.commonpath([base_dir_abs_norm, normalized_full_path])
+    base_dir_nc = base_ctx.norm_case
+    base_dir_prefix = base_ctx.norm_case_prefix
+    full_path_nc = os.path.normcase(normalized_full_path)
 
-    if os.path.normcase(common_path) != os.path.normcase(base_dir_abs_norm):
-         print(f"DEBUG: Path Traversal Attempt Detected! Normalized path '{normalized_full_path}' is outside base dir '{base_dir_abs_norm}'. Common path: '{common_path}'", file=sys.stderr)
+    if full_path_nc != base_dir_nc and not full_path_nc.startswith(base_dir_prefix):
+         print(f"DEBUG: Path Traversal Attempt Detected! Normalized path '{normalized_full_path}' is outside base dir '{base_dir_abs_norm}'.", file=sys.stderr)
          raise ValueError(f"Sanitized path '{normalized_full_path}' is outside base directory '{base_dir}'. Path Traversal attempt?")
 
     # Additional check: Ensure the resulting path is NOT the base dir itself IF the original relative_path
@@ -198,7 +227,7 @@ def sanitize_path(base_dir, relative_path):
     # Let's check if the input `relative_path` was *not* intended to be the base directory itself.
     # Assume "","." and "/" are the only relative_path values that *could* mean the base directory itself.
     if relative_path.strip() not in ["", ".", "/"]:
-         if os.path.normcase(normalized_full_path) == os.path.normcase(base_dir_abs_norm):
+         if full_path_nc == base_dir_nc:
               # This means the sanitized relative path, when joined with the base_dir_abs, resolved back to the base_dir.
               # This implies the relative path was something like "../" or a complex form that normalized incorrectly,
               # or the sanitization process collapsed valid segments too aggressively (unlikely with current logic).
@@ -222,12 +251,17 @@ def _update_status_direct(widget, message):
      if widget and hasattr(widget, 'winfo_exists') and widget.winfo_exists():
         widget.configure(state=tk.NORMAL) # Enable writing
         widget.insert(tk.END, message + "\n")
+        # Keep only the last STATUS_MAX_LINES lines so long sessions don't grow the widget without bound.
+        # Called once per drained batch; the delete only runs once the widget has grown past the cap.
+        if int(widget.index('end-1c').split('.')[0]) > config.STATUS_MAX_LINES:
+            widget.delete('1.0', f"end-{config.STATUS_MAX_LINES + 1}l")
         widget.see(tk.END)
         widget.configure(state=tk.DISABLED) # Disable editing
 
 
 def _update_progress_direct(widget, value):
      """ Directly updates the progress bar value (must run in GUI thread) """
+     # Repeated updates are already collapsed to the newest value by queue_latest_update
      if widget and hasattr(widget, 'config') and widget.winfo_exists():
          widget.config(value=value)
 
@@ -263,10 +297,87 @@ def _show_messagebox_direct(type, title, message):
     else: print(f"Unknown messagebox type: {type} - {title}: {message}", file=sys.stderr)
 
 
-def safe_gui_update(root, command, *args):
-    """ Schedules a GUI update command to be run safely in the main Tkinter thread. """
+def safe_gui_update(root, command, *args, delay_ms=0):
+    """ Schedules a GUI update command to be run safely in the main Tkinter thread (after delay_ms milliseconds). """
     # Check if the root window still exists before scheduling the command.
     # This prevents errors if threads try to update after the GUI is closed.
     if root and hasattr(root, 'after') and root.winfo_exists():
-        root.after(0, lambda: command(*args))
-    # else: print(f"DEBUG: GUI root window closed, skipping GUI update: {command.__name__}", file=sys.stderr)
\ No newline at end of file
+        root.after(delay_ms, lambda: command(*args))
+    # else: print(f"DEBUG: GUI root window closed, skipping GUI update: {command.__name__}", file=sys.stderr)
+
+
+def get_gui_callbacks(gui_callbacks, *names):
+    """ Returns the named entries of a gui_callbacks dict as a tuple, so worker loops can bind them to locals once. """
+    return tuple(gui_callbacks[name] for name in names)
+
+
+# --- Coalesced Status Updates ---
+# Worker threads can emit many status messages in a burst. Instead of scheduling one
+# insert/see/configure cycle per message, messages are queued here and written to the
+# status widget in a single batch by one drain, scheduled STATUS_FLUSH_INTERVAL_MS after
+# the first queued message so everything arriving in that window shares one Tk redraw.
+_status_lock = threading.Lock()
+_pending_status_messages = collections.deque()
+_status_drain_scheduled = False
+
+def queue_status_update(root, widget, message):
+    """ Queues a status message (from any thread) to be appended to the status widget in the next batch. """
+    global _status_drain_scheduled
+    with _status_lock:
+        _pending_status_messages.append(message)
+        if _status_drain_scheduled:
+            return # A drain is already scheduled and will pick this message up
+        _status_drain_scheduled = True
+    safe_gui_update(root, _drain_status_direct, widget, delay_ms=config.STATUS_FLUSH_INTERVAL_MS)
+
+def _drain_status_direct(widget):
+    """ Writes all queued status messages to the status widget at once (must run in GUI thread) """
+    global _status_drain_scheduled
+    with _status_lock:
+        messages = list(_pending_status_messages)
+        _pending_status_messages.clear()
+        _status_drain_scheduled = False
+    if messages:
+        _update_status_direct(widget, "\n".join(messages))
+
+def clear_status_area(widget):
+    """ Clears the status text area and drops the queued, not yet shown messages of the previous operation (must run in GUI thread) """
+    with _status_lock:
+        _pending_status_messages.clear() # A drain that is still scheduled then finds nothing to put back
+    if widget and hasattr(widget, 'winfo_exists') and widget.winfo_exists():
+        widget.configure(state=tk.NORMAL) # A disabled Text widget ignores delete()
+        widget.delete('1.0', tk.END)
+        widget.configure(state=tk.DISABLED)
+
+def show_messagebox_after_status(root, status_widget, type, title, message):
+    """ Schedules a messagebox (from any thread) that opens only after the status messages queued before it are shown. """
+    safe_gui_update(root, _show_messagebox_after_status_direct, status_widget, type, title, message)
+
+def _show_messagebox_after_status_direct(status_widget, type, title, message):
+    """ Writes the queued status messages, then shows the (blocking) messagebox (must run in GUI thread) """
+    _drain_status_direct(status_widget) # Otherwise the lines leading up to the dialog would appear only after it is closed
+    _show_messagebox_direct(type, title, message)
+
+
+# --- Coalesced Progress/Speed Updates ---
+# For the progress bar and speed label only the newest value matters. A worker posting updates faster than
+# the GUI thread runs them would queue one after() callback per update; here a pending update is overwritten
+# in place instead, so at most one callback per widget is waiting in the Tk event queue.
+_latest_update_lock = threading.Lock()
+_pending_latest_updates = {} # (command, id(widget)) -> (widget, newest value)
+
+def queue_latest_update(root, command, widget, value):
+    """ Schedules command(widget, value) in the GUI thread, replacing any still pending value for the same widget. """
+    key = (command, id(widget))
+    with _latest_update_lock:
+        already_scheduled = key in _pending_latest_updates
+        _pending_latest_updates[key] = (widget, value)
+    if not already_scheduled:
+        safe_gui_update(root, _apply_latest_update_direct, key)
+
+def _apply_latest_update_direct(key):
+    """ Applies the newest pending value for one widget (must run in GUI thread) """
+    with _latest_update_lock:
+        pending = _pending_latest_updates.pop(key, None)
+    if pending:
+        key[0](*pending)